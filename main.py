@@ -1,35 +1,67 @@
-from flask import Flask, request, render_template_string, jsonify, session, redirect, url_for, flash
-import json
+from flask import Flask, request, render_template, stream_template, jsonify, session, redirect, url_for, flash
+from flask.json.provider import JSONProvider
+from markupsafe import Markup
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import os
 import threading
 import logging
+import logging.handlers
+import queue
 import time
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import uuid
+import hashlib
+import math
+import functools
+import atexit
+import signal
+from types import MappingProxyType
 
 # --- Logging setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("main.log"),
-        logging.StreamHandler()
-    ]
-)
+# Request threads only enqueue records; a listener thread does the file and console writes
+log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+log_file_handler = logging.FileHandler("main.log", delay=True)
+log_file_handler.setFormatter(log_formatter)
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(log_formatter)
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, log_file_handler, log_stream_handler)
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # the listener's handlers apply the real format
+logging.basicConfig(level=logging.INFO, handlers=[log_queue_handler])
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
+class OrjsonProvider(JSONProvider):
+    # jsonify() and request.get_json() go through orjson instead of the stdlib encoder
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str), mimetype="application/json")
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret-key")
 
 # --- Kill Switch Configuration ---
 KILL_SWITCH_DELAY = 300    # 5 minute debounce (seconds)
 MAX_STALE_PRICE = 600      # 10 minute price expiry (seconds)
+STOP_LOSS_INTERVAL = 2     # seconds between stop-loss/kill switch passes
+STOP_LOSS_MAX_BACKOFF = 60 # longest wait between passes while the checker keeps failing
 
 # --- Kill Switch State ---
-kill_switch_lock = threading.Lock()
 kill_switch_equity_open = {}  # bot_id -> {'date': str, 'open': float}
 kill_switch_breach_start = {}  # bot_id -> datetime or None
 
@@ -87,16 +119,35 @@ def format_profit(profit):
         logger.error(f"PROFIT FORMAT ERROR - Value: '{profit}' | Type: {type(profit)} | Error: {str(e)}")
         return "--"
 
-app.jinja_env.filters['format_price'] = format_price
-app.jinja_env.filters['format_volume'] = format_volume
-app.jinja_env.filters['format_profit'] = format_profit
+def markup_filter(formatter):
+    # Formatter output is only digits, signs, commas and "$", so skip autoescaping it.
+    # Prices, amounts and balances repeat across rows and page loads, so memoize the formatted cell.
+    cached = functools.lru_cache(maxsize=4096)(lambda value: Markup(formatter(value)))
+    def filter_value(value):
+        try:
+            return cached(value)
+        except TypeError:  # unhashable values from hand-edited files
+            return Markup(formatter(value))
+    return filter_value
+
+app.jinja_env.filters['format_price'] = markup_filter(format_price)
+app.jinja_env.filters['format_volume'] = markup_filter(format_volume)
+app.jinja_env.filters['format_profit'] = markup_filter(format_profit)
 
 # --- Configuration ---
 SETTINGS_PASSWORD = "bot"  # CHANGE for production!
 STARTING_BALANCE = 1000.00
-file_lock = threading.Lock()
+
+EDMONTON_TZ = ZoneInfo("America/Edmonton")
 
 DATA_DIR = "data"
+# How hard account writes push to disk: "strict" fsyncs the trade log and the snapshot,
+# "batched" fsyncs only the balance/positions snapshot, "none" leaves both to the OS
+DURABILITY = os.environ.get("DURABILITY", "batched").lower()
+# A typo here would silently weaken durability, so refuse to start instead
+if DURABILITY not in ("none", "batched", "strict"):
+    raise ValueError(f"Invalid DURABILITY {DURABILITY!r}: expected none, batched or strict")
+ACCOUNT_SAVE_DEBOUNCE = 0.2  # seconds the writer waits after a save so a webhook burst lands in one write
 os.makedirs(DATA_DIR, exist_ok=True)
 
 BOTS = {
@@ -104,29 +155,63 @@ BOTS = {
         "name": "Coinbot 1.0",
         "color": "#06D1BF",
         "data_file": os.path.join(DATA_DIR, "account_1.json"),
+        "trade_log_file": os.path.join(DATA_DIR, "trades_1.ndjson"),
         "kill_switch_file": os.path.join(DATA_DIR, "kill_switch_1.json")
     },
     "2.0": {
         "name": "Coinbot 2.0",
         "color": "#FACB39",
         "data_file": os.path.join(DATA_DIR, "account_2.json"),
+        "trade_log_file": os.path.join(DATA_DIR, "trades_2.ndjson"),
         "kill_switch_file": os.path.join(DATA_DIR, "kill_switch_2.json")
     },
     "3.0": {
         "name": "Coinbot 3.0",
         "color": "#FF4B57",
         "data_file": os.path.join(DATA_DIR, "account_3.json"),
+        "trade_log_file": os.path.join(DATA_DIR, "trades_3.ndjson"),
         "kill_switch_file": os.path.join(DATA_DIR, "kill_switch_3.json")
     }
 }
 
-def pretty_now():
-    try:
-        return datetime.now(ZoneInfo("America/Edmonton")).strftime('%Y-%m-%d %H:%M:%S %Z')
-    except:
-        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+# One lock per bot guards that bot's account, trade log, settings and kill switch files
+bot_locks = {bot_id: threading.RLock() for bot_id in BOTS}
+
+written_file_bytes = {}  # path -> (bytes this process last wrote or read there, file mtime_ns at that point)
+
+def write_file_atomic(path, data):
+    # Callers serialize writes per path: the bot's lock for settings and kill switch files,
+    # account_flush_lock for account snapshots. Returns False when the file already holds exactly these bytes;
+    # the mtime check catches hand edits made since our last write, which must still be overwritten
+    cached = written_file_bytes.get(path)
+    if cached and cached[0] == data and cached[1] == file_mtime(path):
+        return False
+    # Write-then-rename: readers see either the old file or the new one, never a truncated write
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+        if DURABILITY != "none":
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+    written_file_bytes[path] = (data, file_mtime(path))
+    return True
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S %Z'
+
+pretty_now_cache = (None, "")  # (unix second, formatted timestamp) of the last call
 
-kraken_pairs = {
+def pretty_now():
+    # Timestamps have one-second resolution, so reuse the formatted string within the same second
+    global pretty_now_cache
+    second = int(time.time())
+    cached_second, formatted = pretty_now_cache
+    if cached_second != second:
+        formatted = datetime.fromtimestamp(second, EDMONTON_TZ).strftime(TIMESTAMP_FORMAT)
+        pretty_now_cache = (second, formatted)
+    return formatted
+
+kraken_pairs = MappingProxyType({
     "BTCUSDT": "XBTUSDT",
     "ETHUSDT": "ETHUSDT",
     "SOLUSDT": "SOLUSD",
@@ -142,11 +227,43 @@ kraken_pairs = {
     "TRXUSDT": "TRXUSD",
     "LINKUSDT": "LINKUSD",
     "ATOMUSDT": "ATOMUSD",
-}
+})
+
+# Reverse lookup from the pair names Kraken returns to our symbols. Older
+# pairs come back under X/Z-prefixed names, e.g. XRPUSD -> XXRPZUSD.
+kraken_symbols = {}
+for sym, pair in kraken_pairs.items():
+    kraken_symbols[pair] = sym
+    if len(pair) == 6 and pair.endswith("USD"):
+        kraken_symbols[f"X{pair[:3]}Z{pair[3:]}"] = sym
+# Both maps are built once at import and shared read-only across threads
+kraken_symbols = MappingProxyType(kraken_symbols)
 
 latest_prices = {}
-last_price_update = {'time': pretty_now(), 'prev_time': pretty_now()}
-last_price_update_dt = datetime.now(ZoneInfo("America/Edmonton"))
+startup_time = pretty_now()
+last_price_update = {'time': startup_time, 'prev_time': startup_time}
+last_price_update_dt = datetime.now(EDMONTON_TZ)
+
+# --- Price Feed Configuration ---
+PRICE_CACHE_TTL = 5  # seconds a Kraken quote is reused before refetching
+last_price_fetch = 0.0  # time.monotonic() of the last successful fetch
+price_fetched_at = {}  # symbol -> time.monotonic() of its last successful quote
+price_fetch_lock = threading.Lock()
+price_fetch_failures = 0  # consecutive Kraken fetches that returned no prices
+price_update_event = threading.Event()  # set whenever new quotes land in latest_prices
+price_version = 0  # bumped only when a fetch actually changes a quote; keys dashboard ETags
+rejected_pairs = {}  # symbol -> time.monotonic() when Kraken last rejected its pair on its own
+PRICE_POLL_MAX_BACKOFF = 60  # longest wait between polls while Kraken keeps failing
+PRICE_STALE_AFTER = 30  # seconds without a successful fetch before the dashboard flags prices as stale
+
+kraken_session = requests.Session()
+# Retry transient connection errors and 429/5xx replies on the pooled keep-alive connections
+kraken_session.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",))
+))
+kraken_session.headers.update({"Accept": "application/json"})
 
 # --- Kill Switch Functions ---
 def load_kill_switch_state(bot_id):
@@ -160,9 +277,9 @@ def load_kill_switch_state(bot_id):
     if not os.path.exists(kill_switch_file):
         return default_state
     try:
-        with file_lock:
-            with open(kill_switch_file, "r") as f:
-                state = json.load(f)
+        # Writers replace the file atomically, so reads need no lock
+        with open(kill_switch_file, "rb") as f:
+            state = orjson.loads(f.read())
         # Ensure all required keys exist
         for key, value in default_state.items():
             if key not in state:
@@ -175,27 +292,50 @@ def load_kill_switch_state(bot_id):
 def save_kill_switch_state(bot_id, state):
     kill_switch_file = BOTS[bot_id]["kill_switch_file"]
     try:
-        with file_lock:
-            with open(kill_switch_file, "w") as f:
-                json.dump(state, f, indent=2)
-        logger.info(f"Kill switch state saved for bot {bot_id}")
+        with bot_locks[bot_id]:
+            if write_file_atomic(kill_switch_file, orjson.dumps(state, option=orjson.OPT_INDENT_2)):
+                logger.info(f"Kill switch state saved for bot {bot_id}")
     except Exception as e:
         logger.error(f"Error saving kill switch state {bot_id}: {str(e)}")
         raise
 
-def reset_kill_switch_daily():
-    today = datetime.now(ZoneInfo("America/Edmonton")).strftime('%Y-%m-%d')
+WARNING_REPEAT_INTERVAL = 300  # seconds before a recurring background warning is logged again
+last_warned = {}  # warning key -> time.monotonic() it was last logged
+
+def warn_throttled(key, message):
+    # Background loops hit the same condition every pass; log it once per interval instead of every wake
+    now = time.monotonic()
+    if now - last_warned.get(key, -WARNING_REPEAT_INTERVAL) >= WARNING_REPEAT_INTERVAL:
+        last_warned[key] = now
+        logger.warning(message)
+
+def unpriced_symbols(positions, prices):
+    # Held symbols with no usable quote; equity computed without them would value those positions wrongly
+    return sorted(symbol for symbol, position_list in positions.items()
+                  if position_list and not prices.get(symbol, 0) > 0)
+
+def reset_kill_switch_daily(prices):
+    # Callers pass the prices they already fetched for every bot's positions
+    if not last_price_fetch:
+        return  # Nothing has been priced since startup; the day's starting equity would be a guess
+    today = datetime.now(EDMONTON_TZ).strftime('%Y-%m-%d')
     for bot_id in BOTS:
-        with kill_switch_lock:
+        with bot_locks[bot_id]:
             state = load_kill_switch_state(bot_id)
             if state.get("starting_equity_date") != today:
                 # Calculate starting equity for the day
-                account = load_account(bot_id)
-                all_symbols = set(account["positions"].keys())
-                prices = fetch_latest_prices(list(all_symbols))
+                try:
+                    account = load_account(bot_id)
+                except Exception:
+                    continue  # Unreadable account files; logged by load_account
+                missing = unpriced_symbols(account["positions"], prices)
+                if missing:
+                    # Retried on the next call; never lock in a starting equity from a partial price map
+                    warn_throttled(("daily_reset", bot_id), f"Postponing kill switch daily reset for bot {bot_id}, no price for: {', '.join(missing)}")
+                    continue
                 position_stats = calculate_position_stats(account["positions"], prices)
-                total_margin = sum(pos['margin_used'] for pos in position_stats)
-                total_pl = sum(pos['pnl'] for pos in position_stats)
+                total_margin = sum(pos.margin_used for pos in position_stats)
+                total_pl = sum(pos.pnl for pos in position_stats)
                 available_cash = float(account["balance"])
                 equity = available_cash + total_margin + total_pl
 
@@ -210,88 +350,323 @@ def reset_kill_switch_daily():
                 logger.info(f"Kill switch daily reset for bot {bot_id} with starting equity {equity}")
 
 # --- Core Functions ---
+def request_ticker(pairs):
+    # One Ticker round-trip; returns the symbols Kraken priced and any errors it reported
+    resp = kraken_session.get("https://api.kraken.com/0/public/Ticker", params={"pair": pairs}, timeout=10)
+    data = orjson.loads(resp.content)
+    # Only walk the pairs Kraken actually returned
+    prices = {
+        kraken_symbols[result_pair]: float(result['c'][0])
+        for result_pair, result in (data.get('result') or {}).items()
+        if result_pair in kraken_symbols
+    }
+    return prices, data.get('error')
+
+def fetch_ticker_batch(symbols):
+    # Kraken voids a whole batch over one unknown pair (EQuery errors). Split such a batch in half until
+    # the bad pair stands alone: a few requests, once, instead of one per pair. Rate limits and other
+    # EGeneral/EService errors are transient, so those are neither split nor marked as rejected.
+    pairs = ",".join(kraken_pairs[sym] for sym in symbols)
+    prices, errors = request_ticker(pairs)
+    if not errors:
+        return prices
+    logger.warning(f"Kraken returned errors for {pairs}: {errors}")
+    missing = [sym for sym in symbols if sym not in prices]
+    if not missing or not any(str(error).startswith("EQuery") for error in errors):
+        return prices
+    if len(symbols) == 1:
+        rejected_pairs[symbols[0]] = time.monotonic()
+        return prices
+    half = len(missing) // 2 or 1
+    for part in (missing[:half], missing[half:]):
+        if part:
+            prices.update(fetch_ticker_batch(part))
+    return prices
+
 def fetch_latest_prices(symbols):
-    global last_price_update_dt
-    symbols_to_fetch = set(sym for sym in symbols if sym in kraken_pairs)
+    global last_price_update_dt, last_price_fetch, price_fetch_failures, price_version
+    symbols_to_fetch = {sym for sym in symbols if sym in kraken_pairs}
     symbols_to_fetch.add("BTCUSDT")
-    prices = {}
-    got_one = False
-    for sym in symbols_to_fetch:
-        pair = kraken_pairs[sym]
-        url = f"https://api.kraken.com/0/public/Ticker?pair={pair}"
-        try:
-            resp = requests.get(url, timeout=10)
-            data = resp.json()
-            if 'result' in data and data['result']:
-                result = list(data['result'].values())[0]
-                last = float(result['c'][0])
-                prices[sym] = last
-                got_one = True
-        except Exception as e:
-            logger.warning(f"Error fetching {sym} from Kraken: {e}")
-    if got_one:
-        latest_prices.update(prices)
-        prev_time = last_price_update['time']
-        last_price_update['prev_time'] = prev_time
-        last_price_update['time'] = pretty_now()
-        last_price_update_dt = datetime.now(ZoneInfo("America/Edmonton"))
-        logger.info(f"Fetched Kraken prices at {last_price_update['time']} for: {', '.join(prices.keys())}")
-    else:
-        logger.warning("Kraken API returned no prices, using previous prices")
-    return latest_prices.copy()
+    # Serialize fetches so the dashboard and the stop-loss thread share one round-trip
+    with price_fetch_lock:
+        now = time.monotonic()
+        stale = [sym for sym in sorted(symbols_to_fetch)
+                 if now - price_fetched_at.get(sym, -PRICE_CACHE_TTL) >= PRICE_CACHE_TTL]
+        # Pairs Kraken rejected stay out of the batch; once their backoff expires each is re-probed on its own
+        batch = [sym for sym in stale if sym not in rejected_pairs]
+        probes = [sym for sym in stale if sym in rejected_pairs
+                  and now - rejected_pairs[sym] >= PRICE_POLL_MAX_BACKOFF]
+        if not batch and not probes:
+            return latest_prices.copy()
+        # Kraken's Ticker endpoint takes a comma-separated pair list, so one round-trip covers every symbol
+        prices = {}
+        for group in ([batch] if batch else []) + [[sym] for sym in probes]:
+            try:
+                prices.update(fetch_ticker_batch(group))
+            except Exception as e:
+                logger.warning(f"Error fetching {', '.join(kraken_pairs[sym] for sym in group)} from Kraken: {e}")
+        for sym in probes:
+            if sym in prices:
+                del rejected_pairs[sym]
+        if prices:
+            if any(latest_prices.get(sym) != price for sym, price in prices.items()):
+                price_version += 1
+            latest_prices.update(prices)
+            fetched_at = time.monotonic()
+            for sym in prices:
+                price_fetched_at[sym] = fetched_at
+            prev_time = last_price_update['time']
+            last_price_update['prev_time'] = prev_time
+            last_price_update['time'] = pretty_now()
+            last_price_update_dt = datetime.now(EDMONTON_TZ)
+            last_price_fetch = fetched_at
+            price_fetch_failures = 0
+            price_update_event.set()
+            # The poller fetches every few seconds, so skip building this line when INFO is filtered out
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Fetched Kraken prices at {last_price_update['time']} for: {', '.join(prices)}")
+        else:
+            price_fetch_failures += 1
+            logger.warning("Kraken API returned no prices, using previous prices")
+        return latest_prices.copy()
 
 def get_kraken_price(symbol):
     return latest_prices.get(symbol, 0)
 
-def load_account(bot_id):
+def read_trade_log(trade_log_file, trade_count=None):
+    # trade_count is how many trades the snapshot has seen. Trades are appended before the snapshot
+    # is replaced, so lines past it belong to a save whose snapshot never landed and are cut off.
+    trade_log = []
+    if not os.path.exists(trade_log_file):
+        return trade_log
+    keep = None  # byte offset to truncate at, when a tail has to go
+    terminated = True
+    with open(trade_log_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        # Stream line by line so a long history never sits in memory twice
+        for line in f:
+            end = offset + len(line)
+            terminated = line.endswith(b"\n")
+            line = line.strip()
+            if line:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    if end < size:
+                        logger.warning(f"Skipping undecodable line at byte {offset} of {trade_log_file}")
+                        offset = end
+                        continue
+                    # A crash mid-append leaves a torn last line
+                    logger.warning(f"Dropping torn last line of {trade_log_file}")
+                    keep = offset
+                    break
+                if trade_count is not None and len(trade_log) == trade_count:
+                    logger.warning(f"Dropping trades past the snapshot's trade_count ({trade_count}) from {trade_log_file}")
+                    keep = offset
+                    break
+                trade_log.append(entry)
+            offset = end
+    if trade_count is not None and len(trade_log) < trade_count:
+        logger.warning(f"{trade_log_file} holds {len(trade_log)} trades but the snapshot counted {trade_count}")
+    # Later appends must start on a fresh line, not glue onto a torn or unterminated one
+    if keep is not None:
+        with open(trade_log_file, "r+b") as f:
+            f.truncate(keep)
+    elif not terminated:
+        with open(trade_log_file, "ab") as f:
+            f.write(b"\n")
+    return trade_log
+
+trade_log_handles = {}  # bot_id -> append handle kept open on that bot's NDJSON trade log
+
+def encode_trades(trades):
+    # Timestamps are already strings from pretty_now(), so every field encodes natively
+    return [orjson.dumps(entry) + b"\n" for entry in trades]
+
+def append_trade_lines(bot_id, lines):
+    # Callers serialize appends per bot: account_flush_lock for saves, the bot's lock for the one-off legacy migration
+    f = trade_log_handles.get(bot_id)
+    if f is None:
+        f = trade_log_handles[bot_id] = open(BOTS[bot_id]["trade_log_file"], "ab")
+    try:
+        f.writelines(lines)
+        f.flush()
+        if DURABILITY == "strict":
+            os.fsync(f.fileno())
+    except Exception:
+        # Reopen on the next append rather than reuse a handle in an unknown state
+        del trade_log_handles[bot_id]
+        f.close()
+        raise
+
+# --- Account State ---
+# Accounts are read from disk once and then kept authoritative in memory;
+# disk only receives new trade lines and changed balance/position snapshots.
+account_cache = {}  # bot_id -> in-memory account state
+pending_account_saves = {}  # bot_id -> latest account state not yet written to disk
+trade_log_counts = {}  # bot_id -> number of trades already in the NDJSON log
+account_versions = defaultdict(int)  # bot_id -> bumped on every save, used for dashboard ETags
+account_save_event = threading.Event()
+account_flush_lock = threading.Lock()  # the writer thread and the atexit hook never drain at the same time
+
+def copy_account(account):
+    # Positions are mutated in place by callers. The trade log is an immutable tuple shared by every copy;
+    # writers extend it with `account["trade_log"] += (entry,)`, which rebinds only their own copy
+    return {
+        "balance": account["balance"],
+        "positions": {symbol: [dict(p) for p in positions] for symbol, positions in account["positions"].items()},
+        "trade_log": account["trade_log"]
+    }
+
+# Bumped whenever normalize_legacy_positions learns a new fix-up, so older snapshots pass through it once more
+ACCOUNT_SCHEMA_VERSION = 1
+POSITION_FLOAT_FIELDS = (("volume", 0.0), ("entry_price", 0.0), ("margin_used", 0.0), ("stop_loss_pct", 2.5), ("take_profit_pct", 3.0))
+
+def normalize_legacy_positions(positions):
+    for symbol_positions in positions.values():
+        for position in symbol_positions:
+            position.setdefault("type", "long")
+            for key, default in POSITION_FLOAT_FIELDS:
+                value = position.get(key, default)
+                position[key] = value if type(value) is float else float(value)
+            leverage = position.get("leverage", 1)
+            position["leverage"] = leverage if type(leverage) is int else int(leverage)
+            # Older positions may lack margin_used; derive it once here so readers can rely on it
+            if not position["margin_used"] and position["leverage"]:
+                position["margin_used"] = position["entry_price"] * position["volume"] / position["leverage"]
+            for key in ("stop_loss_price", "take_profit_price"):
+                value = position.get(key)
+                position[key] = value if value is None or type(value) is float else float(value)
+            # Older positions only stored stop_loss_pct; fix the trigger price here so the stop-loss scan is a plain compare
+            if position["stop_loss_price"] is None:
+                direction = position_direction(position["type"])
+                position["stop_loss_price"] = position["entry_price"] * (1 - direction * position["stop_loss_pct"] / 100)
+
+def read_account(bot_id):
     data_file = BOTS[bot_id]["data_file"]
+    trade_log_file = BOTS[bot_id]["trade_log_file"]
     if not os.path.exists(data_file):
+        trade_log_counts[bot_id] = 0
         return {
             "balance": STARTING_BALANCE,
             "positions": {},
-            "trade_log": []
-        }
-    try:
-        with file_lock:
-            with open(data_file, "r") as f:
-                account = json.load(f)
-        account["balance"] = float(account.get("balance", STARTING_BALANCE))
-        account["positions"] = account.get("positions", {})
-        account["trade_log"] = account.get("trade_log", [])
-
-        for symbol in account["positions"]:
-            for position in account["positions"][symbol]:
-                if "type" not in position:
-                    position["type"] = "long"
-        for symbol in account["positions"]:
-            for position in account["positions"][symbol]:
-                position["volume"] = float(position.get("volume", 0))
-                position["entry_price"] = float(position.get("entry_price", 0))
-                position["leverage"] = int(position.get("leverage", 1))
-                position["margin_used"] = float(position.get("margin_used", 0))
-                position["stop_loss_pct"] = float(position.get("stop_loss_pct", 2.5))
-                position["take_profit_pct"] = float(position.get("take_profit_pct", 3.0)) if "take_profit_pct" in position else 3.0
-                position["stop_loss_price"] = float(position.get("stop_loss_price", 0)) if "stop_loss_price" in position else None
-                position["take_profit_price"] = float(position.get("take_profit_price", 0)) if "take_profit_price" in position else None
-        return account
-    except Exception as e:
-        logger.error(f"Error loading account {bot_id}: {str(e)}")
-        return {
-            "balance": STARTING_BALANCE,
-            "positions": {},
-            "trade_log": []
+            "trade_log": ()
         }
+    with open(data_file, "rb") as f:
+        raw = f.read()
+        raw_mtime = os.fstat(f.fileno()).st_mtime_ns
+    account = orjson.loads(raw)
+    # Trade history lives in an append-only NDJSON file next to the snapshot
+    legacy_trade_log = account.pop("trade_log", None)
+    if os.path.exists(trade_log_file):
+        trade_log = read_trade_log(trade_log_file, account.get("trade_count"))
+    else:
+        trade_log = legacy_trade_log or []
+        if trade_log:
+            append_trade_lines(bot_id, encode_trades(trade_log))
+            logger.info(f"Migrated {len(trade_log)} trades for bot {bot_id} to {trade_log_file}")
+    trade_log_counts[bot_id] = len(trade_log)
+    if legacy_trade_log is None:
+        written_file_bytes[data_file] = (raw, raw_mtime)
+    account["balance"] = float(account.get("balance", STARTING_BALANCE))
+    account["positions"] = account.get("positions", {})
+    account["trade_log"] = tuple(trade_log)
+    account.pop("trade_count", None)
+
+    # Snapshots stamped with the current schema_version already hold canonical types;
+    # anything older is normalized once, then rewritten in the new format
+    if account.get("schema_version", 0) < ACCOUNT_SCHEMA_VERSION:
+        normalize_legacy_positions(account["positions"])
+        pending_account_saves[bot_id] = account
+        account_save_event.set()
+        logger.info(f"Normalized legacy account file for bot {bot_id}")
+    return account
+
+def load_account(bot_id):
+    with bot_locks[bot_id]:
+        account = account_cache.get(bot_id)
+        if account is None:
+            try:
+                account = read_account(bot_id)
+            except Exception as e:
+                # Serving a default account here would let the next save overwrite the real snapshot
+                logger.error(f"Error loading account {bot_id}: {str(e)}")
+                raise
+            account_cache[bot_id] = account
+        return copy_account(account)
 
 def save_account(bot_id, account):
+    # Publish the new state to readers right away; account_writer persists it off the request thread
+    with bot_locks[bot_id]:
+        account = copy_account(account)
+        account_cache[bot_id] = account
+        pending_account_saves[bot_id] = account
+        account_versions[bot_id] += 1
+    account_save_event.set()
+
+def write_account(bot_id, account):
+    # Runs under account_flush_lock, so this thread is the only writer of the bot's trade log and
+    # snapshot files. Published accounts are never mutated, so encoding and disk I/O (including
+    # fsync) happen without the bot's lock; readers of account_cache never wait on the disk.
     data_file = BOTS[bot_id]["data_file"]
-    try:
-        with file_lock:
-            with open(data_file, "w") as f:
-                json.dump(account, f, indent=2, default=str)
-        logger.info(f"Account data saved for bot {bot_id}")
-    except Exception as e:
-        logger.error(f"Error saving account {bot_id}: {str(e)}")
-        raise
+    trade_log = account["trade_log"]
+    written = trade_log_counts.get(bot_id, 0)
+    trade_lines = encode_trades(trade_log[written:])
+    snapshot = orjson.dumps({
+        "balance": account["balance"],
+        "positions": account["positions"],
+        "trade_count": len(trade_log),
+        "schema_version": ACCOUNT_SCHEMA_VERSION
+    })
+    if trade_lines:
+        append_trade_lines(bot_id, trade_lines)
+        with bot_locks[bot_id]:
+            trade_log_counts[bot_id] = len(trade_log)
+    # Most saves only touch the trade log; an identical snapshot is not rewritten
+    if not write_file_atomic(data_file, snapshot):
+        return
+    logger.info(f"Account data saved for bot {bot_id}")
+
+def flush_account_saves():
+    with account_flush_lock:
+        for bot_id in BOTS:
+            with bot_locks[bot_id]:
+                account = pending_account_saves.get(bot_id)
+            if account is None:
+                continue
+            try:
+                write_account(bot_id, account)
+            except Exception as e:
+                logger.error(f"Error saving account {bot_id}: {str(e)}")
+                continue
+            with bot_locks[bot_id]:
+                # Only clear the slot if no newer state was queued while writing
+                if pending_account_saves.get(bot_id) is account:
+                    del pending_account_saves[bot_id]
+
+def account_writer():
+    while True:
+        # Failed writes stay pending and are retried on the next wakeup
+        if account_save_event.wait(timeout=5):
+            time.sleep(ACCOUNT_SAVE_DEBOUNCE)
+        account_save_event.clear()
+        flush_account_saves()
+
+# Persist whatever the writer has not drained yet when the process exits
+atexit.register(flush_account_saves)
+
+def handle_sigterm(signum, frame):
+    # atexit handlers don't run on SIGTERM (container stop, process managers), so flush here first
+    flush_account_saves()
+    raise SystemExit(0)
+
+try:
+    signal.signal(signal.SIGTERM, handle_sigterm)
+except ValueError:
+    pass  # Signal handlers can only be installed from the main thread, e.g. not when imported by a worker
+
+settings_cache = {}  # bot_id -> (settings file mtime_ns, parsed settings)
 
 def load_bot_settings(bot_id):
     settings_file = os.path.join(DATA_DIR, f"settings_{bot_id}.json")
@@ -302,16 +677,22 @@ def load_bot_settings(bot_id):
         "buy_hours": "00:00-23:59",
         "kill_switch_pct": 5.0
     }
-    if not os.path.exists(settings_file):
+    mtime = file_mtime(settings_file)
+    if mtime is None:
         return default_settings
+    # Reparse only when the file changed, including hand edits; callers get their own copy
+    cached = settings_cache.get(bot_id)
+    if cached and cached[0] == mtime:
+        return dict(cached[1])
     try:
-        with file_lock:
-            with open(settings_file, "r") as f:
-                settings = json.load(f)
+        # Writers replace the file atomically, so reads need no lock
+        with open(settings_file, "rb") as f:
+            settings = orjson.loads(f.read())
         for k, v in default_settings.items():
             if k not in settings:
                 settings[k] = v
-        return settings
+        settings_cache[bot_id] = (mtime, settings)
+        return dict(settings)
     except Exception as e:
         logger.error(f"Error loading settings for bot {bot_id}: {str(e)}")
         return default_settings
@@ -319,10 +700,11 @@ def load_bot_settings(bot_id):
 def save_bot_settings(bot_id, settings):
     settings_file = os.path.join(DATA_DIR, f"settings_{bot_id}.json")
     try:
-        with file_lock:
-            with open(settings_file, "w") as f:
-                json.dump(settings, f, indent=2)
-        logger.info(f"Settings saved for bot {bot_id}")
+        with bot_locks[bot_id]:
+            if write_file_atomic(settings_file, orjson.dumps(settings, option=orjson.OPT_INDENT_2)):
+                # Seed the cache so the next load_bot_settings doesn't reparse what we just wrote
+                settings_cache[bot_id] = (file_mtime(settings_file), dict(settings))
+                logger.info(f"Settings saved for bot {bot_id}")
     except Exception as e:
         logger.error(f"Error saving settings for bot {bot_id}: {str(e)}")
         raise
@@ -347,80 +729,129 @@ def is_in_buy_window(now_time, buy_hours_str):
                 return True
     return False
 
+# --- Webhook Signal Parsing ---
+VALID_ACTIONS = frozenset(("buy", "sell", "short", "cover"))
+WebhookSignal = namedtuple("WebhookSignal", ["bot_id", "action", "symbol", "reason"])
+# Accepted spellings of each bot name with spaces removed, e.g. "1.0" or "Coinbot 1.0"
+BOT_ALIASES = {}
+for bot_id in BOTS:
+    BOT_ALIASES[bot_id] = bot_id
+    BOT_ALIASES[f"coinbot{bot_id}"] = bot_id
+
+def parse_webhook_signal(data):
+    # Normalize and validate the TradingView payload in one pass; ValueError carries the client-facing message
+    if not isinstance(data, dict):
+        raise ValueError("Invalid JSON payload")
+    bot_raw = str(data.get("bot", "")).lower().replace(" ", "")
+    bot_id = BOT_ALIASES.get(bot_raw)
+    if bot_id is None:
+        raise ValueError(f"Unknown bot: {bot_raw}")
+    action = str(data.get("action", "")).lower()
+    if action not in VALID_ACTIONS:
+        raise ValueError(f"Invalid action: {action}")
+    symbol = str(data.get("symbol", "")).upper()
+    if not symbol:
+        raise ValueError("Missing symbol")
+    # Only symbols with a Kraken pair can ever be priced; reject the rest before touching the network
+    if symbol not in kraken_pairs:
+        raise ValueError(f"Unsupported symbol: {symbol}")
+    reason = data.get("reason", "TradingView signal")
+    return WebhookSignal(bot_id, action, symbol, reason)
+
 # --- Calculation Functions ---
+def position_direction(position_type):
+    # +1 for longs, -1 for shorts, so one formula covers both sides
+    return 1 if position_type == "long" else -1
+
+def position_pnl(position_type, entry, price, volume):
+    return (price - entry) * volume * position_direction(position_type)
+
+# Per-position dashboard row; a namedtuple is lighter than a dict for these throwaway records
+PositionStat = namedtuple("PositionStat", [
+    "symbol", "type", "volume", "entry_price", "current_price", "leverage", "margin_used", "position_size",
+    "pnl", "pl_class", "stop_loss_pct", "stop_loss_price", "take_profit_pct", "take_profit_price"
+])
+
 def calculate_position_stats(positions, prices):
     position_stats = []
     for symbol, position_list in positions.items():
         current_price = prices.get(symbol, 0)
         for position in position_list:
-            entry = float(position.get("entry_price", 0))
-            volume = float(position.get("volume", 0))
-            leverage = int(position.get("leverage", 1))
-            margin_used = float(position.get("margin_used", 0))
-            stop_loss_pct = float(position.get("stop_loss_pct", 2.5))
-            take_profit_pct = float(position.get("take_profit_pct", 3.0))
-            position_type = position.get("type", "long")
-
-            if not margin_used and entry and volume and leverage:
-                margin_used = (entry * volume) / leverage
+            # Positions are normalized to floats/ints at load, so read them as-is
+            entry = position["entry_price"]
+            volume = position["volume"]
+            leverage = position["leverage"]
+            margin_used = position["margin_used"]
+            stop_loss_pct = position["stop_loss_pct"]
+            take_profit_pct = position["take_profit_pct"]
+            position_type = position["type"]
 
             position_size = margin_used * leverage
 
-            if position_type == "long":
-                pnl = (current_price - entry) * volume
-                stop_loss_price = entry * (1 - stop_loss_pct/100)
-                take_profit_price = entry * (1 + take_profit_pct/100)
-            else:
-                pnl = (entry - current_price) * volume
-                stop_loss_price = entry * (1 + stop_loss_pct/100)
-                take_profit_price = entry * (1 - take_profit_pct/100)
+            direction = position_direction(position_type)
+            pnl = (current_price - entry) * volume * direction
+            stop_loss_price = entry * (1 - direction * stop_loss_pct/100)
+            take_profit_price = entry * (1 + direction * take_profit_pct/100)
 
             pl_class = "profit" if pnl > 0 else "loss" if pnl < 0 else ""
 
-            position_stats.append({
-                'symbol': symbol,
-                'type': position_type,
-                'volume': volume,
-                'entry_price': entry,
-                'current_price': current_price,
-                'leverage': leverage,
-                'margin_used': margin_used,
-                'position_size': position_size,
-                'pnl': pnl,
-                'pl_class': pl_class,
-                'stop_loss_pct': stop_loss_pct,
-                'stop_loss_price': stop_loss_price,
-                'take_profit_pct': take_profit_pct,
-                'take_profit_price': take_profit_price
-            })
+            position_stats.append(PositionStat(
+                symbol, position_type, volume, entry, current_price, leverage, margin_used, position_size,
+                pnl, pl_class, stop_loss_pct, stop_loss_price, take_profit_pct, take_profit_price
+            ))
     return position_stats
 
-def calculate_coin_stats(trade_log):
-    coin_stats = {}
-    for log in trade_log:
-        if 'symbol' in log and 'profit' in log and log['profit'] is not None:
-            coin = log['symbol']
-            profit = float(log['profit']) if log['profit'] is not None else 0
-            coin_stats[coin] = coin_stats.get(coin, 0) + profit
-    return coin_stats
+coin_profit_cache = {}  # bot_id -> (trades already folded in, {coin: exact-sum partials})
+
+def add_to_partials(partials, x):
+    # Shewchuk's running sum (what math.fsum does internally): the partials add up to the exact total
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    partials[i:] = [x]
+
+def calculate_coin_stats(bot_id, trade_log):
+    # The trade log is append-only, so each call folds in only the entries added since the last one
+    with bot_locks[bot_id]:
+        counted, partials_by_coin = coin_profit_cache.get(bot_id, (0, None))
+        if partials_by_coin is None or counted > len(trade_log):
+            counted, partials_by_coin = 0, defaultdict(list)
+        for log in trade_log[counted:]:
+            profit = log.get('profit')
+            if profit is not None and 'symbol' in log:
+                add_to_partials(partials_by_coin[log['symbol']], float(profit))
+        coin_profit_cache[bot_id] = (len(trade_log), partials_by_coin)
+        # The partials stay a handful of floats per coin, so totals cost O(coins), exact like fsum
+        return {coin: math.fsum(partials) for coin, partials in partials_by_coin.items()}
 
 def get_bitcoin_price():
     price = latest_prices.get("BTCUSDT")
     return format_price(price) if price else "--"
 
-def group_trades_by_date(trade_log):
+def group_trades_by_date(trade_log, max_days=None):
+    # trade_log is appended in time order, so walk it newest-first and stop once max_days dates are collected
     trades_by_date = defaultdict(list)
-    for log in trade_log:
+    for log in reversed(trade_log):
         ts = log.get('timestamp')
         if ts:
             date_str = ts.split()[0]
+            if max_days and date_str not in trades_by_date and len(trades_by_date) >= max_days:
+                break
             trades_by_date[date_str].append(log)
+    for logs in trades_by_date.values():
+        logs.reverse()
     return dict(sorted(trades_by_date.items(), reverse=True))
 
 # --- Kill Switch Liquidation ---
-def liquidate_all_positions(bot_id, account, prices, reason="Kill Switch Triggered"):
+def liquidate_all_positions(bot_id, account, prices, timestamp, reason="Kill Switch Triggered"):
     modified = False
-    timestamp = pretty_now()
     for symbol, positions in account["positions"].items():
         current_price = prices.get(symbol, 0)
         if not current_price or current_price <= 0:
@@ -431,18 +862,14 @@ def liquidate_all_positions(bot_id, account, prices, reason="Kill Switch Trigger
             position_type = position.get("type", "long")
             entry = float(position.get("entry_price", 0))
             volume = float(position.get("volume", 0))
-            margin_used = float(position.get("margin_used", 0))
+            margin_used = position["margin_used"]
             leverage = int(position.get("leverage", 1))
 
-            if position_type == "long":
-                profit = (current_price - entry) * volume
-                action = "sell"
-            else:
-                profit = (entry - current_price) * volume
-                action = "cover"
+            profit = position_pnl(position_type, entry, current_price, volume)
+            action = "sell" if position_type == "long" else "cover"
 
             account["balance"] += margin_used + profit
-            account["trade_log"].append({
+            account["trade_log"] += ({
                 "timestamp": timestamp,
                 "action": action,
                 "symbol": symbol,
@@ -453,7 +880,7 @@ def liquidate_all_positions(bot_id, account, prices, reason="Kill Switch Trigger
                 "balance": round(account["balance"], 8),
                 "leverage": leverage,
                 "avg_entry": round(entry, 8),
-            })
+            },)
             modified = True
             logger.info(f"{reason} liquidation: {action} {symbol} at {current_price} (bot {bot_id})")
         account["positions"][symbol] = new_positions
@@ -461,313 +888,473 @@ def liquidate_all_positions(bot_id, account, prices, reason="Kill Switch Trigger
         save_account(bot_id, account)
     return modified
 
+# --- Templates ---
+DASHBOARD_HTML = '''
+<!DOCTYPE html>
+<html>
+<head>
+    <title>CoinBot Dashboard</title>
+    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css">
+    <style>
+        body { background: linear-gradient(120deg,#1a1d28 0%, #131520 100%); font-family: 'Segoe UI', 'Roboto', 'Montserrat', Arial, sans-serif; color: #e2e2e2;}
+        .header-logo-hover {
+            transition: all 0.3s ease;
+        }
+        .header-logo-hover:hover {
+            transform: scale(1.05);
+            opacity: 0.9;
+        }
+        .btc-price { display: inline-flex; align-items: center; margin-left: 14px; vertical-align: middle;}
+        .btc-logo { vertical-align: middle; margin-right: 4px; margin-top: -2px;}
+        .nav-tabs .nav-link { font-size: 1.2em; font-weight: 600; background: #222431; border: none; color: #AAA; border-radius: 0; margin-right: 2px; transition: background 0.2s, color 0.2s;}
+        .nav-tabs .nav-link.active, .nav-tabs .nav-link:hover { background: linear-gradient(90deg, #232f43 60%, #232d3a 100%); color: #ffe082 !important; border-bottom: 3px solid #ffe082;}
+        .bot-panel { background: rgba(27,29,39,0.93); border-radius: 18px; padding: 24px 18px; margin-top: 28px; box-shadow: 0 6px 32px #0009, 0 1.5px 6px #0003; border: 1.5px solid #33395b88; position: relative;}
+        .bot-panel h3 { font-weight: bold; font-size: 2em; letter-spacing: 1px;}
+        .bot-panel h5, .bot-panel h6 { color: #ccc;}
+        .profit { color: #18e198; font-weight: bold;}
+        .loss { color: #fd4561; font-weight: bold;}
+        .kill-switch-green { color: #18e198; }
+        .kill-switch-red { color: #fd4561; }
+        table { background: rgba(19,21,32,0.92); border-radius: 13px; overflow: hidden; margin-bottom: 22px; box-shadow: 0 2px 16px #0003;}
+        th, td { padding: 10px 7px; text-align: center; border-bottom: 1px solid #24273a;}
+        th { background: #25273a; color: #ffe082; font-size: 1.04em;}
+        tr:last-child td { border-bottom: none; }
+        .table-sm th, .table-sm td { font-size: 0.98em; }
+        .tab-content { margin-top: 0; }
+        .footer { margin-top: 24px; font-size: 0.99em; color: #888; text-align: right;}
+        @media (max-width: 1200px) { .container { max-width: 99vw;}}
+    </style>
+</head>
+<body>
+<div class="container mt-4">
+    <div class="mb-4 d-flex align-items-center">
+        <img src="{{ url_for('static', filename='COINBO.png') }}" 
+             alt="COINBO Logo" 
+             style="height: 125px; margin-right: 300px;"
+             class="header-logo-hover">
+        <span class="btc-price">
+            <svg class="btc-logo" viewBox="0 0 30 30" width="26" height="26">
+              <circle cx="15" cy="15" r="14" fill="#F7931A"/>
+              <text x="8" y="23" font-size="20" font-family="Arial" font-weight="bold" fill="#fff">₿</text>
+            </svg>
+            <span id="btc-price" style="color:#F7931A; font-weight:bold; font-size:1.32em; letter-spacing:1px;">{{ btc_price }}</span>
+        </span>
+        <span style="margin-left: 18px;">
+            <a href="{{ url_for('settings', bot=active) }}" class="btn btn-sm btn-warning">Settings</a>
+        </span>
+        <span style="margin-left: 8px;">
+            {% if session.get('settings_auth') %}
+                <a href="{{ url_for('settings_logout') }}" class="btn btn-sm btn-secondary">Logout</a>
+            {% endif %}
+        </span>
+    </div>
+    <ul class="nav nav-tabs" id="botTabs" role="tablist">
+        {% for bot_id, bot_data in dashboards.items() %}
+        <li class="nav-item" role="presentation">
+            <a class="nav-link {% if active == bot_id %}active{% endif %} bot-tab"
+               href="{{ url_for('dashboard', active=bot_id) }}"
+               style="color: {{ bot_data['bot']['color'] }};"
+               >{{ bot_data["bot"]["name"] }}</a>
+        </li>
+        {% endfor %}
+    </ul>
+    <div class="tab-content">
+        {% for bot_id, bot_data in dashboards.items() %}
+        <div class="tab-pane fade {% if active == bot_id %}show active{% endif %}" id="bot{{ bot_id }}">
+            <div class="bot-panel" style="box-shadow: 0 2px 12px {{ bot_data['bot']['color'] }}33;">
+                <h3 style="color: {{ bot_data['bot']['color'] }};">{{ bot_data["bot"]["name"] }}</h3>
+                <h5>Balance: <span data-bot="{{ bot_id }}" data-field="available_cash" style="color:{{ bot_data['bot']['color'] }};">{{ bot_data['available_cash']|format_price }}</span>
+                    | Equity: <span data-bot="{{ bot_id }}" data-field="equity" style="color:{{ bot_data['bot']['color'] }};">{{ bot_data['equity']|format_price }}</span>
+                </h5>
+                <h6>Total P/L: <span data-bot="{{ bot_id }}" data-field="total_pl" class="{% if bot_data['total_pl'] > 0 %}profit{% elif bot_data['total_pl'] < 0 %}loss{% endif %}">{{ bot_data['total_pl']|format_price }}</span></h6>
+                <h6>Kill Switch: <span data-kill-switch="{{ bot_id }}" class="kill-switch-{{ bot_data['kill_switch_color'] }}">
+                    {% if bot_data['kill_switch_status']['active'] %}
+                        Activated - Trading Halted
+                        <a href="{{ url_for('reset_kill_switch', bot=bot_id, reset_uuid=bot_data['kill_switch_status']['reset_uuid']) }}"
+                           class="btn btn-sm btn-danger ms-2">Reset</a>
+                    {% else %}
+                        <span data-bot="{{ bot_id }}" data-field="kill_switch_text">{{ bot_data['kill_switch_text'] }}</span>
+                    {% endif %}
+                </span></h6>
+                <h5 class="mt-4 mb-2">Open Positions</h5>
+                <table class="table table-sm table-striped">
+                    <thead>
+                        <tr>
+                            <th>Symbol</th>
+                            <th>Volume</th>
+                            <th>Entry Price</th>
+                            <th>Current Price</th>
+                            <th>Leverage</th>
+                            <th>Margin Used</th>
+                            <th>Position Size</th>
+                            <th>Unrealized P/L</th>
+                            <th>Stop Loss %</th>
+                            <th>Stop Loss Price</th>
+                            <th>Take Profit %</th>
+                            <th>Take Profit Price</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                    {% for pos in bot_data['position_stats'] %}
+                        <tr data-bot="{{ bot_id }}" data-pos="{{ loop.index0 }}"><td>{{ pos.symbol }}</td>
+                            <td>{{ pos.volume|format_volume }}</td>
+                            <td>{{ pos.entry_price|format_price }}</td>
+                            <td data-col="current_price">{{ pos.current_price|format_price }}</td>
+                            <td>{{ pos.leverage }}x</td>
+                            <td>{{ pos.margin_used|format_price }}</td>
+                            <td>{{ pos.position_size|format_price }}</td>
+                            <td data-col="pnl" class="{{ pos.pl_class }}">{{ pos.pnl|format_profit }}</td>
+                            <td>{{ pos.stop_loss_pct }}%</td>
+                            <td>{{ pos.stop_loss_price|format_price }}</td>
+                            <td>{{ pos.take_profit_pct }}%</td>
+                            <td>{{ pos.take_profit_price|format_price }}</td></tr>
+                    {% else %}
+                        <tr><td colspan="12">No open positions</td></tr>
+                    {% endfor %}
+                    </tbody>
+                </table>
+                <h5 class="mt-4 mb-2">Trade Log (by day)</h5>
+                <ul class="nav nav-tabs" id="dayTabs{{ bot_id }}" role="tablist">
+                    {% for d in bot_data['trade_days'] %}
+                        <li class="nav-item" role="presentation">
+                            <button class="nav-link {% if loop.first %}active{% endif %}"
+                                id="tab-{{ bot_id }}-{{ d }}"
+                                data-bs-toggle="tab"
+                                data-bs-target="#day-{{ bot_id }}-{{ d }}"
+                                type="button"
+                                role="tab"
+                                aria-controls="day-{{ bot_id }}-{{ d }}"
+                                aria-selected="{{ 'true' if loop.first else 'false' }}">
+                                {{ d }}
+                            </button>
+                        </li>
+                    {% endfor %}
+                </ul>
+                <div class="tab-content" id="tabContent-{{ bot_id }}">
+                    {% for d in bot_data['trade_days'] %}
+                    <div class="tab-pane fade {% if loop.first %}show active{% endif %}" id="day-{{ bot_id }}-{{ d }}" role="tabpanel">
+                        <table class="table table-sm table-striped">
+                            <thead>
+                                <tr>
+                                    <th>Time</th>
+                                    <th>Action</th>
+                                    <th>Symbol</th>
+                                    <th>Reason</th>
+                                    <th>Price</th>
+                                    <th>Amount</th>
+                                    <th>Profit</th>
+                                    <th>P/L %</th>
+                                    <th>Balance</th>
+                                    <th>Leverage</th>
+                                    <th>Avg Entry</th>
+                                </tr>
+                            </thead>
+                            <tbody>
+                                {% for log in bot_data['trade_log_by_day'][d] %}
+                                    {% set profit = log.get('profit') %}
+                                    {% set pl_class = 'profit' if profit and profit|float > 0 else 'loss' if profit and profit|float < 0 else '' %}
+                                    <tr><td>{{ log.get('timestamp', '') }}</td>
+                                        <td>{{ log.get('action', '') }}</td>
+                                        <td>{{ log.get('symbol', '') }}</td>
+                                        <td>{{ log.get('reason', '') }}</td>
+                                        <td>{{ log.get('price', 0)|format_price }}</td>
+                                        <td>{{ log.get('amount', 0)|format_volume }}</td>
+                                        <td class="{{ pl_class }}">{{ profit|format_profit if profit is not none else '' }}</td>
+                                        <td class="{{ pl_class }}">{{ log.get('pl_pct', '') }}</td>
+                                        <td>{{ log.get('balance', 0)|format_price }}</td>
+                                        <td>{{ log.get('leverage', '') }}</td>
+                                        <td>{{ log.get('avg_entry')|format_price if log.get('avg_entry') not in (none, '') else '' }}</td></tr>
+                                {% else %}
+                                    <tr><td colspan="11">No trades for this day</td></tr>
+                                {% endfor %}
+                            </tbody>
+                        </table>
+                    </div>
+                    {% endfor %}
+                </div>
+                <h5 class="mt-4 mb-2">Coin P/L Summary</h5>
+                <table class="table table-sm">
+                    <tr><th>Coin</th><th>Total P/L</th></tr>
+                    {% for coin, pl in bot_data['coin_stats'] %}
+                        <tr><td>{{ coin }}</td>
+                            <td class="{{ 'profit' if pl > 0 else 'loss' if pl < 0 else '' }}">{{ pl|format_profit }}</td></tr>
+                    {% else %}
+                        <tr><td colspan="2">No trades yet</td></tr>
+                    {% endfor %}
+                </table>
+            </div>
+        </div>
+        {% endfor %}
+    </div>
+    <div class="footer">
+        <span id="prices-stale" class="badge bg-warning text-dark{% if not prices_stale %} d-none{% endif %}">Prices stale</span>
+        Updated: <span id="updated-at">{{now}}</span><br>
+        CoinBotAutoUpdate: {{ coinbot_update_time }}
+    </div>
+</div>
+<script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
+<script>
+// Poll /api/state for live prices and P/L; reload only when trades, settings or kill switch state change the layout
+(function () {
+    var layoutVersion = "{{ layout_version }}";
+    function setCell(el, text, cls) {
+        el.textContent = text;
+        el.classList.remove("profit", "loss");
+        if (cls) el.classList.add(cls);
+    }
+    function refresh() {
+        fetch("{{ url_for('api_state') }}", {cache: "no-store"})
+            .then(function (resp) { return resp.json(); })
+            .then(function (state) {
+                if (state.version !== layoutVersion) {
+                    location.reload();
+                    return;
+                }
+                document.getElementById("btc-price").textContent = state.btc_price;
+                document.getElementById("updated-at").textContent = state.now;
+                document.getElementById("prices-stale").classList.toggle("d-none", !state.prices_stale);
+                Object.keys(state.bots).forEach(function (botId) {
+                    var bot = state.bots[botId];
+                    document.querySelectorAll('span[data-bot="' + botId + '"]').forEach(function (el) {
+                        var field = el.dataset.field;
+                        if (field === "total_pl") setCell(el, bot.total_pl, bot.total_pl_class);
+                        else el.textContent = bot[field];
+                    });
+                    var killSwitch = document.querySelector('span[data-kill-switch="' + botId + '"]');
+                    if (killSwitch) killSwitch.className = "kill-switch-" + bot.kill_switch_color;
+                    document.querySelectorAll('tr[data-bot="' + botId + '"]').forEach(function (row) {
+                        var pos = bot.positions[row.dataset.pos];
+                        if (!pos) return;
+                        row.querySelector('[data-col="current_price"]').textContent = pos[0];
+                        setCell(row.querySelector('[data-col="pnl"]'), pos[1], pos[2]);
+                    });
+                });
+            })
+            .catch(function () {});
+    }
+    setInterval(refresh, 5000);
+})();
+</script>
+</body>
+</html>
+'''
+DASHBOARD_TEMPLATE = app.jinja_env.from_string(DASHBOARD_HTML)
+
+# --- Dashboard ---
+# Bots are independent, so their dashboard panels are built concurrently
+dashboard_executor = ThreadPoolExecutor(max_workers=len(BOTS))
+
+def kill_switch_summary(bot_id, equity, today):
+    # Kill switch calculations, shared by the full dashboard render and the /api/state refresh
+    with bot_locks[bot_id]:
+        kill_switch_status = load_kill_switch_state(bot_id)
+        starting_equity = kill_switch_status.get("starting_equity")
+        if starting_equity is None or kill_switch_status.get("starting_equity_date") != today:
+            # Log warning but rely on reset_kill_switch_daily to set the correct value
+            warn_throttled(("starting_equity", bot_id), f"Starting equity not found or outdated for bot {bot_id}, should be set by reset_kill_switch_daily")
+            starting_equity = equity  # Fallback to avoid division by zero
+        equity_change_pct = ((equity - starting_equity) / starting_equity * 100) if starting_equity > 0 else 0
+        kill_switch_color = "red" if kill_switch_status["active"] else "green" if equity_change_pct >= 0 else "red"
+        equity_change_pct = round(equity_change_pct, 2)
+        breach_time_remaining = 0
+        if kill_switch_breach_start.get(bot_id):
+            breach_duration = (datetime.now(EDMONTON_TZ) - kill_switch_breach_start[bot_id]).total_seconds()
+            breach_time_remaining = int(max(0, KILL_SWITCH_DELAY - breach_duration))
+    if breach_time_remaining > 0:
+        kill_switch_text = f"Breach Detected ({format_profit(equity_change_pct)}% equity change, {breach_time_remaining}s remaining)"
+    elif equity_change_pct >= 0:
+        kill_switch_text = f"In Profit ({format_profit(equity_change_pct)}%)"
+    else:
+        kill_switch_text = f"In Loss ({format_profit(equity_change_pct)}%)"
+    return {
+        'kill_switch_status': kill_switch_status,
+        'kill_switch_color': kill_switch_color,
+        'kill_switch_text': kill_switch_text,
+        'equity_change_pct': equity_change_pct,
+        'breach_time_remaining': breach_time_remaining
+    }
+
+def build_bot_dashboard(bot_id, prices, today):
+    account = load_account(bot_id)
+    position_stats = calculate_position_stats(account["positions"], prices)
+    total_margin = 0.0
+    total_pl = 0.0
+    for pos in position_stats:
+        total_margin += pos.margin_used
+        total_pl += pos.pnl
+    available_cash = float(account["balance"])
+    equity = available_cash + total_margin + total_pl
+
+    kill_switch = kill_switch_summary(bot_id, equity, today)
+    logger.info(f"Bot {bot_id}: equity={equity}, equity_change_pct={kill_switch['equity_change_pct']}")
+
+    grouped_trades = group_trades_by_date(account["trade_log"], max_days=7)
+    last_7_days = list(grouped_trades.keys())[:7]
+
+    # Newest trade first within each day
+    trade_log_by_day = {d: list(reversed(grouped_trades[d])) for d in last_7_days}
+
+    coin_stats = sorted(calculate_coin_stats(bot_id, account["trade_log"]).items())
+
+    return {
+        'bot': BOTS[bot_id],
+        'account': account,
+        'equity': equity,
+        'available_cash': available_cash,
+        'total_pl': total_pl,
+        'coin_stats': coin_stats,
+        'position_stats': position_stats,
+        'trade_log_by_day': trade_log_by_day,
+        'trade_days': last_7_days,
+        **kill_switch
+    }
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def dashboard_layout_version():
+    # Anything that adds or removes rows, or changes kill switch state, needs a full page render
+    state = []
+    for bot_id in BOTS:
+        state.append((
+            account_versions[bot_id],
+            bool(kill_switch_breach_start.get(bot_id)),
+            file_mtime(BOTS[bot_id]["kill_switch_file"]),
+            file_mtime(os.path.join(DATA_DIR, f"settings_{bot_id}.json"))
+        ))
+    return hashlib.blake2b(repr(state).encode(), digest_size=8).hexdigest()
+
+def dashboard_etag(active_bot, today, prices_stale):
+    # A running kill switch countdown changes every second, so those pages are never cached
+    if any(kill_switch_breach_start.get(bot_id) for bot_id in BOTS):
+        return None
+    state = [active_bot, today, bool(session.get('settings_auth')), price_version, prices_stale]
+    for bot_id in BOTS:
+        state.append((
+            account_versions[bot_id],
+            file_mtime(BOTS[bot_id]["kill_switch_file"]),
+            file_mtime(os.path.join(DATA_DIR, f"settings_{bot_id}.json"))
+        ))
+    return hashlib.blake2b(repr(state).encode(), digest_size=8).hexdigest()
+
+SETTINGS_LOGIN_HTML = """
+        <h2>Enter Settings Password</h2>
+        <form method="POST">
+            <input type="password" name="password" autofocus>
+            <button type="submit">Login</button>
+        </form>
+        {% if error %}<div style="color:red">{{ error }}</div>{% endif %}
+        <p><a href="{{ url_for('dashboard') }}">Back to dashboard</a></p>
+"""
+SETTINGS_LOGIN_TEMPLATE = app.jinja_env.from_string(SETTINGS_LOGIN_HTML)
+
+SETTINGS_HTML = '''
+        <h2>Settings for {{ bot["name"] }}</h2>
+        <form method="POST">
+            <div class="mb-3">
+                <label class="form-label">Leverage</label>
+                <input type="number" name="leverage" value="{{ settings['leverage'] }}" min="1" max="20" class="form-control">
+            </div>
+            <div class="mb-3">
+                <label class="form-label">Stop Loss (%)</label>
+                <input type="number" name="stop_loss_pct" value="{{ settings['stop_loss_pct'] }}" step="0.1" min="0.1" max="20" class="form-control">
+            </div>
+            <div class="mb-3">
+                <label class="form-label">Take Profit (%)</label>
+                <input type="number" name="take_profit_pct" value="{{ settings['take_profit_pct'] }}" step="0.1" min="0.1" max="50" class="form-control">
+            </div>
+            <div class="mb-3">
+                <label class="form-label">Kill Switch Loss (%)</label>
+                <input type="number" name="kill_switch_pct" value="{{ settings['kill_switch_pct'] }}" step="0.1" min="0.1" max="50" class="form-control">
+                <div style="font-size:0.94em;color:#999;margin-top:2px;">{{ kill_switch_help }}</div>
+            </div>
+            <div class="mb-3">
+                <label class="form-label">Allowed Buy Hours (local time)</label>
+                <input type="text" name="buy_hours" value="{{ settings['buy_hours'] }}" class="form-control">
+                <div style="font-size:0.94em;color:#999;margin-top:2px;">{{ buy_hours_help }}</div>
+            </div>
+            <button type="submit" class="btn btn-primary">Save</button>
+            <a href="{{ url_for('dashboard') }}" class="btn btn-secondary">Cancel</a>
+        </form>
+'''
+SETTINGS_TEMPLATE = app.jinja_env.from_string(SETTINGS_HTML)
+
 # --- Routes ---
 @app.route('/')
 def dashboard():
     active_bot = request.args.get("active", "1.0")
     if active_bot not in BOTS:
         active_bot = "1.0"
-    dashboards = {}
     prev_update_time = last_price_update.get('prev_time', last_price_update['time'])
-    all_symbols = set()
-    for bot_id in BOTS:
-        account = load_account(bot_id)
-        all_symbols.update(account["positions"].keys())
-    all_symbols.add("BTCUSDT")
-    prices = fetch_latest_prices(list(all_symbols))
+    # The stop-loss thread keeps prices fresh; never block a page load on Kraken
+    prices = latest_prices.copy()
+    prices_stale = time.monotonic() - last_price_fetch > PRICE_STALE_AFTER
 
-    today = datetime.now(ZoneInfo("America/Edmonton")).strftime('%Y-%m-%d')
-    # Ensure daily reset has run to set starting equity
-    reset_kill_switch_daily()
+    today = datetime.now(EDMONTON_TZ).strftime('%Y-%m-%d')
+    # Ensure daily reset has run to set starting equity, but never from stale quotes; the checker will do it once prices are fresh
+    if not prices_stale:
+        reset_kill_switch_daily(prices)
 
-    for bot_id in BOTS:
-        account = load_account(bot_id)
-        position_stats = calculate_position_stats(account["positions"], prices)
-        total_margin = sum(pos['margin_used'] for pos in position_stats)
-        total_pl = sum(pos['pnl'] for pos in position_stats)
-        available_cash = float(account["balance"])
-        equity = available_cash + total_margin + total_pl
+    # Skip building and rendering when nothing shown on the page has changed
+    etag = dashboard_etag(active_bot, today, prices_stale)
+    if etag is not None and etag in request.if_none_match:
+        return "", 304, {"ETag": f'"{etag}"'}
 
-        # Kill switch calculations
-        with kill_switch_lock:
-            kill_switch_status = load_kill_switch_state(bot_id)
-            starting_equity = kill_switch_status.get("starting_equity")
-            if starting_equity is None or kill_switch_status.get("starting_equity_date") != today:
-                # Log warning but rely on reset_kill_switch_daily to set the correct value
-                logger.warning(f"Starting equity not found or outdated for bot {bot_id}, should be set by reset_kill_switch_daily")
-                starting_equity = equity  # Fallback to avoid division by zero
-            equity_change_pct = ((equity - starting_equity) / starting_equity * 100) if starting_equity > 0 else 0
-            logger.info(f"Bot {bot_id}: equity={equity}, starting_equity={starting_equity}, equity_change_pct={equity_change_pct}")
-            kill_switch_color = "red" if kill_switch_status["active"] else "green" if equity_change_pct >= 0 else "red"
-            breach_time_remaining = 0
-            if kill_switch_breach_start.get(bot_id):
-                breach_duration = (datetime.now(ZoneInfo("America/Edmonton")) - kill_switch_breach_start[bot_id]).total_seconds()
-                breach_time_remaining = max(0, KILL_SWITCH_DELAY - breach_duration)
-
-        positions_html = ""
-        for pos in position_stats:
-            positions_html += (
-                f"<tr><td>{pos['symbol']}</td>"
-                f"<td>{format_volume(pos['volume'])}</td>"
-                f"<td>{format_price(pos['entry_price'])}</td>"
-                f"<td>{format_price(pos['current_price'])}</td>"
-                f"<td>{pos['leverage']}x</td>"
-                f"<td>{format_price(pos['margin_used'])}</td>"
-                f"<td>{format_price(pos['position_size'])}</td>"
-                f"<td class='{pos['pl_class']}'>{format_profit(pos['pnl'])}</td>"
-                f"<td>{pos['stop_loss_pct']}%</td>"
-                f"<td>{format_price(pos['stop_loss_price'])}</td>"
-                f"<td>{pos['take_profit_pct']}%</td>"
-                f"<td>{format_price(pos['take_profit_price'])}</td></tr>"
-            )
-        if not positions_html:
-            positions_html = "<tr><td colspan='12'>No open positions</td></tr>"
-
-        grouped_trades = group_trades_by_date(account["trade_log"])
-        last_7_days = list(grouped_trades.keys())[:7]
-
-        trade_log_by_day_html = {}
-        for d in last_7_days:
-            logs = grouped_trades[d]
-            rows = ""
-            for log in reversed(logs):
-                profit = log.get('profit')
-                pl_class = "profit" if profit and float(profit) > 0 else "loss" if profit and float(profit) < 0 else ""
-                avg_entry_val = log.get('avg_entry')
-                avg_entry_str = format_price(avg_entry_val) if avg_entry_val not in (None, '') else ''
-                rows += (
-                    f"<tr><td>{log.get('timestamp', '')}</td>"
-                    f"<td>{log.get('action', '')}</td>"
-                    f"<td>{log.get('symbol', '')}</td>"
-                    f"<td>{log.get('reason', '')}</td>"
-                    f"<td>{format_price(log.get('price', 0))}</td>"
-                    f"<td>{format_volume(log.get('amount', 0))}</td>"
-                    f"<td class='{pl_class}'>{format_profit(profit) if profit is not None else ''}</td>"
-                    f"<td class='{pl_class}'>{log.get('pl_pct', '')}</td>"
-                    f"<td>{format_price(log.get('balance', 0))}</td>"
-                    f"<td>{log.get('leverage', '')}</td>"
-                    f"<td>{avg_entry_str}</td>"
-                    f"</tr>"
-                )
-            if not rows:
-                rows = "<tr><td colspan='11'>No trades for this day</td></tr>"
-            trade_log_by_day_html[d] = rows
-
-        coin_stats = calculate_coin_stats(account["trade_log"])
-        coin_stats_html = ""
-        for coin, pl in sorted(coin_stats.items()):
-            pl_class = "profit" if pl > 0 else "loss" if pl < 0 else ""
-            coin_stats_html += (
-                f"<tr><td>{coin}</td>"
-                f"<td class='{pl_class}'>{format_profit(pl)}</td></tr>"
-            )
-        if not coin_stats_html:
-            coin_stats_html = "<tr><td colspan='2'>No trades yet</td></tr>"
-
-        dashboards[bot_id] = {
-            'bot': BOTS[bot_id],
-            'account': account,
-            'equity': equity,
-            'available_cash': available_cash,
-            'total_pl': total_pl,
-            'coin_stats_html': coin_stats_html,
-            'positions_html': positions_html,
-            'trade_log_by_day_html': trade_log_by_day_html,
-            'trade_days': last_7_days,
-            'kill_switch_status': kill_switch_status,
-            'kill_switch_color': kill_switch_color,
-            'equity_change_pct': round(equity_change_pct, 2),
-            'breach_time_remaining': int(breach_time_remaining)
-        }
+    dashboards = dict(zip(BOTS, dashboard_executor.map(lambda bot_id: build_bot_dashboard(bot_id, prices, today), BOTS)))
 
-    html = '''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>CoinBot Dashboard</title>
-        <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css">
-        <style>
-            body { background: linear-gradient(120deg,#1a1d28 0%, #131520 100%); font-family: 'Segoe UI', 'Roboto', 'Montserrat', Arial, sans-serif; color: #e2e2e2;}
-            .header-logo-hover {
-                transition: all 0.3s ease;
-            }
-            .header-logo-hover:hover {
-                transform: scale(1.05);
-                opacity: 0.9;
-            }
-            .btc-price { display: inline-flex; align-items: center; margin-left: 14px; vertical-align: middle;}
-            .btc-logo { vertical-align: middle; margin-right: 4px; margin-top: -2px;}
-            .nav-tabs .nav-link { font-size: 1.2em; font-weight: 600; background: #222431; border: none; color: #AAA; border-radius: 0; margin-right: 2px; transition: background 0.2s, color 0.2s;}
-            .nav-tabs .nav-link.active, .nav-tabs .nav-link:hover { background: linear-gradient(90deg, #232f43 60%, #232d3a 100%); color: #ffe082 !important; border-bottom: 3px solid #ffe082;}
-            .bot-panel { background: rgba(27,29,39,0.93); border-radius: 18px; padding: 24px 18px; margin-top: 28px; box-shadow: 0 6px 32px #0009, 0 1.5px 6px #0003; border: 1.5px solid #33395b88; position: relative;}
-            .bot-panel h3 { font-weight: bold; font-size: 2em; letter-spacing: 1px;}
-            .bot-panel h5, .bot-panel h6 { color: #ccc;}
-            .profit { color: #18e198; font-weight: bold;}
-            .loss { color: #fd4561; font-weight: bold;}
-            .kill-switch-green { color: #18e198; }
-            .kill-switch-red { color: #fd4561; }
-            table { background: rgba(19,21,32,0.92); border-radius: 13px; overflow: hidden; margin-bottom: 22px; box-shadow: 0 2px 16px #0003;}
-            th, td { padding: 10px 7px; text-align: center; border-bottom: 1px solid #24273a;}
-            th { background: #25273a; color: #ffe082; font-size: 1.04em;}
-            tr:last-child td { border-bottom: none; }
-            .table-sm th, .table-sm td { font-size: 0.98em; }
-            .tab-content { margin-top: 0; }
-            .footer { margin-top: 24px; font-size: 0.99em; color: #888; text-align: right;}
-            @media (max-width: 1200px) { .container { max-width: 99vw;}}
-        </style>
-    </head>
-    <body>
-    <div class="container mt-4">
-        <div class="mb-4 d-flex align-items-center">
-            <img src="{{ url_for('static', filename='COINBO.png') }}" 
-                 alt="COINBO Logo" 
-                 style="height: 125px; margin-right: 300px;"
-                 class="header-logo-hover">
-            <span class="btc-price">
-                <svg class="btc-logo" viewBox="0 0 30 30" width="26" height="26">
-                  <circle cx="15" cy="15" r="14" fill="#F7931A"/>
-                  <text x="8" y="23" font-size="20" font-family="Arial" font-weight="bold" fill="#fff">₿</text>
-                </svg>
-                <span style="color:#F7931A; font-weight:bold; font-size:1.32em; letter-spacing:1px;">{{ btc_price }}</span>
-            </span>
-            <span style="margin-left: 18px;">
-                <a href="{{ url_for('settings', bot=active) }}" class="btn btn-sm btn-warning">Settings</a>
-            </span>
-            <span style="margin-left: 8px;">
-                {% if session.get('settings_auth') %}
-                    <a href="{{ url_for('settings_logout') }}" class="btn btn-sm btn-secondary">Logout</a>
-                {% endif %}
-            </span>
-        </div>
-        <ul class="nav nav-tabs" id="botTabs" role="tablist">
-            {% for bot_id, bot_data in dashboards.items() %}
-            <li class="nav-item" role="presentation">
-                <a class="nav-link {% if active == bot_id %}active{% endif %} bot-tab"
-                   href="{{ url_for('dashboard', active=bot_id) }}"
-                   style="color: {{ bot_data['bot']['color'] }};"
-                   >{{ bot_data["bot"]["name"] }}</a>
-            </li>
-            {% endfor %}
-        </ul>
-        <div class="tab-content">
-            {% for bot_id, bot_data in dashboards.items() %}
-            <div class="tab-pane fade {% if active == bot_id %}show active{% endif %}" id="bot{{ bot_id }}">
-                <div class="bot-panel" style="box-shadow: 0 2px 12px {{ bot_data['bot']['color'] }}33;">
-                    <h3 style="color: {{ bot_data['bot']['color'] }};">{{ bot_data["bot"]["name"] }}</h3>
-                    <h5>Balance: <span style="color:{{ bot_data['bot']['color'] }};">{{ format_price(bot_data['available_cash']) }}</span>
-                        | Equity: <span style="color:{{ bot_data['bot']['color'] }};">{{ format_price(bot_data['equity']) }}</span>
-                    </h5>
-                    <h6>Total P/L: <span class="{% if bot_data['total_pl'] > 0 %}profit{% elif bot_data['total_pl'] < 0 %}loss{% endif %}">{{ format_price(bot_data['total_pl']) }}</span></h6>
-                    <h6>Kill Switch: <span class="kill-switch-{{ bot_data['kill_switch_color'] }}">
-                        {% if bot_data['kill_switch_status']['active'] %}
-                            Activated - Trading Halted
-                            <a href="{{ url_for('reset_kill_switch', bot=bot_id, reset_uuid=bot_data['kill_switch_status']['reset_uuid']) }}"
-                               class="btn btn-sm btn-danger ms-2">Reset</a>
-                        {% elif bot_data['breach_time_remaining'] > 0 %}
-                            Breach Detected ({{ bot_data['equity_change_pct']|format_profit }}% equity change, {{ bot_data['breach_time_remaining'] }}s remaining)
-                        {% else %}
-                            {% if bot_data['equity_change_pct'] >= 0 %}
-                                In Profit ({{ bot_data['equity_change_pct']|format_profit }}%)
-                            {% else %}
-                                In Loss ({{ bot_data['equity_change_pct']|format_profit }}%)
-                            {% endif %}
-                        {% endif %}
-                    </span></h6>
-                    <h5 class="mt-4 mb-2">Open Positions</h5>
-                    <table class="table table-sm table-striped">
-                        <thead>
-                            <tr>
-                                <th>Symbol</th>
-                                <th>Volume</th>
-                                <th>Entry Price</th>
-                                <th>Current Price</th>
-                                <th>Leverage</th>
-                                <th>Margin Used</th>
-                                <th>Position Size</th>
-                                <th>Unrealized P/L</th>
-                                <th>Stop Loss %</th>
-                                <th>Stop Loss Price</th>
-                                <th>Take Profit %</th>
-                                <th>Take Profit Price</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                        {{ bot_data['positions_html']|safe }}
-                        </tbody>
-                    </table>
-                    <h5 class="mt-4 mb-2">Trade Log (by day)</h5>
-                    <ul class="nav nav-tabs" id="dayTabs{{ bot_id }}" role="tablist">
-                        {% for d in bot_data['trade_days'] %}
-                            <li class="nav-item" role="presentation">
-                                <button class="nav-link {% if loop.first %}active{% endif %}"
-                                    id="tab-{{ bot_id }}-{{ d }}"
-                                    data-bs-toggle="tab"
-                                    data-bs-target="#day-{{ bot_id }}-{{ d }}"
-                                    type="button"
-                                    role="tab"
-                                    aria-controls="day-{{ bot_id }}-{{ d }}"
-                                    aria-selected="{{ 'true' if loop.first else 'false' }}">
-                                    {{ d }}
-                                </button>
-                            </li>
-                        {% endfor %}
-                    </ul>
-                    <div class="tab-content" id="tabContent-{{ bot_id }}">
-                        {% for d in bot_data['trade_days'] %}
-                        <div class="tab-pane fade {% if loop.first %}show active{% endif %}" id="day-{{ bot_id }}-{{ d }}" role="tabpanel">
-                            <table class="table table-sm table-striped">
-                                <thead>
-                                    <tr>
-                                        <th>Time</th>
-                                        <th>Action</th>
-                                        <th>Symbol</th>
-                                        <th>Reason</th>
-                                        <th>Price</th>
-                                        <th>Amount</th>
-                                        <th>Profit</th>
-                                        <th>P/L %</th>
-                                        <th>Balance</th>
-                                        <th>Leverage</th>
-                                        <th>Avg Entry</th>
-                                    </tr>
-                                </thead>
-                                <tbody>
-                                    {{ bot_data['trade_log_by_day_html'][d]|safe }}
-                                </tbody>
-                            </table>
-                        </div>
-                        {% endfor %}
-                    </div>
-                    <h5 class="mt-4 mb-2">Coin P/L Summary</h5>
-                    <table class="table table-sm">
-                        <tr><th>Coin</th><th>Total P/L</th></tr>
-                        {{ bot_data['coin_stats_html']|safe }}
-                    </table>
-                </div>
-            </div>
-            {% endfor %}
-        </div>
-        <div class="footer">
-            Updated: {{now}}<br>
-            CoinBotAutoUpdate: {{ coinbot_update_time }}
-        </div>
-    </div>
-    <script src="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js"></script>
-    </body>
-    </html>
-    '''
-    return render_template_string(
-        html,
+    # Stream the page so the response starts going out while later panels and trade rows are still rendering
+    html = stream_template(
+        DASHBOARD_TEMPLATE,
         dashboards=dashboards,
         active=active_bot,
         now=pretty_now(),
+        prices_stale=prices_stale,
+        layout_version=dashboard_layout_version(),
         coinbot_update_time=prev_update_time,
         btc_price=get_bitcoin_price(),
-        session=session,
-        format_price=format_price,
-        format_volume=format_volume,
-        format_profit=format_profit
+        session=session
     )
+    headers = {"Cache-Control": "no-cache"}
+    if etag is not None:
+        headers["ETag"] = f'"{etag}"'
+    return html, 200, headers
+
+@app.route('/api/state')
+def api_state():
+    # Compact per-bot numbers for the dashboard's live refresh; no template render or trade log grouping
+    prices = latest_prices.copy()
+    today = datetime.now(EDMONTON_TZ).strftime('%Y-%m-%d')
+    bots = {}
+    for bot_id in BOTS:
+        account = load_account(bot_id)
+        position_stats = calculate_position_stats(account["positions"], prices)
+        total_margin = 0.0
+        total_pl = 0.0
+        for pos in position_stats:
+            total_margin += pos.margin_used
+            total_pl += pos.pnl
+        available_cash = float(account["balance"])
+        equity = available_cash + total_margin + total_pl
+        kill_switch = kill_switch_summary(bot_id, equity, today)
+        bots[bot_id] = {
+            "available_cash": format_price(available_cash),
+            "equity": format_price(equity),
+            "kill_switch_color": kill_switch["kill_switch_color"],
+            "kill_switch_text": kill_switch["kill_switch_text"],
+            "total_pl": format_price(total_pl),
+            "total_pl_class": "profit" if total_pl > 0 else "loss" if total_pl < 0 else "",
+            "positions": [[format_price(pos.current_price), format_profit(pos.pnl), pos.pl_class] for pos in position_stats]
+        }
+    return jsonify({
+        "version": dashboard_layout_version(),
+        "now": pretty_now(),
+        "prices_stale": time.monotonic() - last_price_fetch > PRICE_STALE_AFTER,
+        "btc_price": get_bitcoin_price(),
+        "bots": bots
+    }), 200, {"Cache-Control": "no-store"}
 
 @app.route('/settings_login', methods=['GET', 'POST'])
 def settings_login():
@@ -780,15 +1367,7 @@ def settings_login():
             return redirect(url_for('settings', bot=request.args.get('bot', '1.0')))
         else:
             error = "Incorrect password"
-    return render_template_string("""
-        <h2>Enter Settings Password</h2>
-        <form method="POST">
-            <input type="password" name="password" autofocus>
-            <button type="submit">Login</button>
-        </form>
-        {% if error %}<div style="color:red">{{ error }}</div>{% endif %}
-        <p><a href="{{ url_for('dashboard') }}">Back to dashboard</a></p>
-    """, error=error)
+    return render_template(SETTINGS_LOGIN_TEMPLATE, error=error)
 
 @app.route('/settings_logout')
 def settings_logout():
@@ -838,35 +1417,7 @@ def settings():
     buy_hours_help = "Example: 09:00-16:00,19:00-22:00 (leave blank for 24h trading). Multiple time windows comma-separated. Uses local time."
     kill_switch_help = "Percentage loss of daily equity that triggers liquidation of all positions after 5 minutes. Range: 0.1-50%."
 
-    return render_template_string('''
-        <h2>Settings for {{ bot["name"] }}</h2>
-        <form method="POST">
-            <div class="mb-3">
-                <label class="form-label">Leverage</label>
-                <input type="number" name="leverage" value="{{ settings['leverage'] }}" min="1" max="20" class="form-control">
-            </div>
-            <div class="mb-3">
-                <label class="form-label">Stop Loss (%)</label>
-                <input type="number" name="stop_loss_pct" value="{{ settings['stop_loss_pct'] }}" step="0.1" min="0.1" max="20" class="form-control">
-            </div>
-            <div class="mb-3">
-                <label class="form-label">Take Profit (%)</label>
-                <input type="number" name="take_profit_pct" value="{{ settings['take_profit_pct'] }}" step="0.1" min="0.1" max="50" class="form-control">
-            </div>
-            <div class="mb-3">
-                <label class="form-label">Kill Switch Loss (%)</label>
-                <input type="number" name="kill_switch_pct" value="{{ settings['kill_switch_pct'] }}" step="0.1" min="0.1" max="50" class="form-control">
-                <div style="font-size:0.94em;color:#999;margin-top:2px;">{{ kill_switch_help }}</div>
-            </div>
-            <div class="mb-3">
-                <label class="form-label">Allowed Buy Hours (local time)</label>
-                <input type="text" name="buy_hours" value="{{ settings['buy_hours'] }}" class="form-control">
-                <div style="font-size:0.94em;color:#999;margin-top:2px;">{{ buy_hours_help }}</div>
-            </div>
-            <button type="submit" class="btn btn-primary">Save</button>
-            <a href="{{ url_for('dashboard') }}" class="btn btn-secondary">Cancel</a>
-        </form>
-    ''', bot=BOTS[bot_id], settings=settings, buy_hours_help=buy_hours_help, kill_switch_help=kill_switch_help)
+    return render_template(SETTINGS_TEMPLATE, bot=BOTS[bot_id], settings=settings, buy_hours_help=buy_hours_help, kill_switch_help=kill_switch_help)
 
 @app.route('/reset_kill_switch')
 def reset_kill_switch():
@@ -879,7 +1430,7 @@ def reset_kill_switch():
         flash("Invalid bot ID", "danger")
         return redirect(url_for('dashboard'))
 
-    with kill_switch_lock:
+    with bot_locks[bot_id]:
         state = load_kill_switch_state(bot_id)
         if state['reset_uuid'] == reset_uuid:
             state['active'] = False
@@ -896,25 +1447,16 @@ def reset_kill_switch():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     try:
-        data = request.get_json()
+        try:
+            data = orjson.loads(request.get_data())
+        except orjson.JSONDecodeError:
+            data = None
         logger.info(f"Webhook received: {data}")
 
-        bot_raw = str(data.get("bot", "")).strip().lower()
-        bot_id = bot_raw.replace("coinbot", "").replace(" ", "") if bot_raw.startswith("coinbot") else bot_raw
-        if bot_id not in BOTS:
-            return jsonify({"status": "error", "message": f"Unknown bot: {bot_id}"}), 400
-
-        with kill_switch_lock:
-            if load_kill_switch_state(bot_id)["active"]:
-                return jsonify({"status": "error", "message": "Trading halted due to kill switch activation"}), 400
-
-        action = str(data.get("action", "")).lower()
-        if action not in ["buy", "sell", "short", "cover"]:
-            return jsonify({"status": "error", "message": f"Invalid action: {action}"}), 400
-
-        symbol = str(data.get("symbol", "")).upper()
-        if not symbol:
-            return jsonify({"status": "error", "message": "Missing symbol"}), 400
+        try:
+            bot_id, action, symbol, reason = parse_webhook_signal(data)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
 
         settings = load_bot_settings(bot_id)
         leverage = settings.get("leverage", 5)
@@ -924,7 +1466,7 @@ def webhook():
         buy_hours_str = settings.get("buy_hours", "00:00-23:59")
 
         if action in ["buy", "short"]:
-            now_local = datetime.now(ZoneInfo("America/Edmonton")).time()
+            now_local = datetime.now(EDMONTON_TZ).time()
             if not is_in_buy_window(now_local, buy_hours_str):
                 return jsonify({
                     "status": "error",
@@ -938,108 +1480,109 @@ def webhook():
             if not price or price <= 0:
                 return jsonify({"status": "error", "message": f"No live Kraken price for {symbol}"}), 400
 
-        account = load_account(bot_id)
-        timestamp = pretty_now()
-        reason = data.get("reason", "TradingView signal")
-
-        if action in ["buy", "short"]:
-            margin_used = account["balance"] * margin_pct
-
-            if margin_used <= 0:
-                return jsonify({"status": "error", "message": "Insufficient balance for allocation"}), 400
-
-            volume = round((margin_used * leverage) / price, 6)
-
-            if len(account["positions"].get(symbol, [])) >= 5:
-                return jsonify({"status": "error", "message": "Position limit reached"}), 400
-
-            if action == "buy":
-                stop_loss_price = price * (1 - stop_loss_pct/100)
-                take_profit_price = price * (1 + take_profit_pct/100)
-                position_type = "long"
-            else:
-                stop_loss_price = price * (1 + stop_loss_pct/100)
-                take_profit_price = price * (1 - take_profit_pct/100)
-                position_type = "short"
-
-            new_position = {
-                "type": position_type,
-                "volume": volume,
-                "entry_price": price,
-                "timestamp": timestamp,
-                "margin_used": margin_used,
-                "leverage": leverage,
-                "stop_loss_pct": stop_loss_pct,
-                "stop_loss_price": stop_loss_price,
-                "take_profit_pct": take_profit_pct,
-                "take_profit_price": take_profit_price
-            }
-            account["positions"].setdefault(symbol, []).append(new_position)
-            account["balance"] -= margin_used
-
-            account["trade_log"].append({
-                "timestamp": timestamp,
-                "action": action,
-                "symbol": symbol,
-                "reason": reason,
-                "price": price,
-                "amount": volume,
-                "balance": round(account["balance"], 2),
-                "leverage": leverage,
-            })
-            save_account(bot_id, account)
-            logger.info(f"{action.upper()} executed for {symbol} at {price} with SL {stop_loss_pct}%, TP {take_profit_pct}% (bot {bot_id})")
-            return jsonify({
-                "status": "success",
-                "action": action,
-                "symbol": symbol,
-                "price": price,
-                "volume": volume,
-                "stop_loss_price": new_position["stop_loss_price"],
-                "take_profit_price": new_position["take_profit_price"]
-            }), 200
-
-        elif action in ["sell", "cover"]:
-            positions = [p for p in account["positions"].get(symbol, [])
-                        if (action == "sell" and p["type"] == "long") or
-                           (action == "cover" and p["type"] == "short")]
-
-            if not positions:
-                return jsonify({"status": "error", "message": f"No {action} positions to close"}), 400
-
-            total_volume = sum(float(p["volume"]) for p in positions)
-            total_margin = sum(float(p["margin_used"]) for p in positions)
-            avg_entry = sum(float(p["entry_price"]) * float(p["volume"]) for p in positions) / total_volume if total_volume > 0 else 0
-
-            if action == "sell":
-                profit = (price - avg_entry) * total_volume
-            else:
-                profit = (avg_entry - price) * total_volume
-
-            pl_pct = ((price - avg_entry) / avg_entry * 100) if avg_entry > 0 else 0
-            if action == "cover":
-                pl_pct = -pl_pct
-
-            account["balance"] += total_margin + profit
-
-            account["positions"][symbol] = [p for p in account["positions"].get(symbol, [])
-                                          if p not in positions]
+        # Hold the bot's lock from the kill switch check through save_account so concurrent
+        # signals and the stop-loss thread cannot interleave read-modify-write cycles
+        with bot_locks[bot_id]:
+            if load_kill_switch_state(bot_id)["active"]:
+                return jsonify({"status": "error", "message": "Trading halted due to kill switch activation"}), 400
 
-            account["trade_log"].append({
-                "timestamp": timestamp,
-                "action": action,
-                "symbol": symbol,
-                "reason": reason,
-                "price": price,
-                "amount": total_volume,
-                "profit": round(profit, 8),
-                "pl_pct": round(pl_pct, 4),
-                "balance": round(account["balance"], 8),
-                "avg_entry": round(avg_entry, 8),
-            })
-            save_account(bot_id, account)
-            logger.info(f"{action.upper()} executed for {symbol} at {price} (bot {bot_id})")
-            return jsonify({"status": "success", "action": action, "symbol": symbol, "price": price}), 200
+            account = load_account(bot_id)
+            timestamp = pretty_now()
+
+            if action in ["buy", "short"]:
+                margin_used = account["balance"] * margin_pct
+
+                if margin_used <= 0:
+                    return jsonify({"status": "error", "message": "Insufficient balance for allocation"}), 400
+
+                volume = round((margin_used * leverage) / price, 6)
+
+                if len(account["positions"].get(symbol, [])) >= 5:
+                    return jsonify({"status": "error", "message": "Position limit reached"}), 400
+
+                position_type = "long" if action == "buy" else "short"
+                direction = position_direction(position_type)
+                stop_loss_price = price * (1 - direction * stop_loss_pct/100)
+                take_profit_price = price * (1 + direction * take_profit_pct/100)
+
+                new_position = {
+                    "type": position_type,
+                    "volume": volume,
+                    "entry_price": price,
+                    "timestamp": timestamp,
+                    "margin_used": margin_used,
+                    "leverage": leverage,
+                    "stop_loss_pct": stop_loss_pct,
+                    "stop_loss_price": stop_loss_price,
+                    "take_profit_pct": take_profit_pct,
+                    "take_profit_price": take_profit_price
+                }
+                account["positions"].setdefault(symbol, []).append(new_position)
+                account["balance"] -= margin_used
+
+                account["trade_log"] += ({
+                    "timestamp": timestamp,
+                    "action": action,
+                    "symbol": symbol,
+                    "reason": reason,
+                    "price": price,
+                    "amount": volume,
+                    "balance": round(account["balance"], 2),
+                    "leverage": leverage,
+                },)
+                save_account(bot_id, account)
+                logger.info(f"{action.upper()} executed for {symbol} at {price} with SL {stop_loss_pct}%, TP {take_profit_pct}% (bot {bot_id})")
+                return jsonify({
+                    "status": "success",
+                    "action": action,
+                    "symbol": symbol,
+                    "price": price,
+                    "volume": volume,
+                    "stop_loss_price": new_position["stop_loss_price"],
+                    "take_profit_price": new_position["take_profit_price"]
+                }), 200
+
+            elif action in ["sell", "cover"]:
+                # Split the symbol's positions into the ones this action closes and the ones it keeps, in one pass
+                close_type = "long" if action == "sell" else "short"
+                positions, remaining = [], []
+                for p in account["positions"].get(symbol, []):
+                    (positions if p["type"] == close_type else remaining).append(p)
+
+                if not positions:
+                    return jsonify({"status": "error", "message": f"No {action} positions to close"}), 400
+
+                total_volume = total_margin = weighted_entry = 0.0
+                for p in positions:
+                    volume = p["volume"]
+                    total_volume += volume
+                    total_margin += p["margin_used"]
+                    weighted_entry += p["entry_price"] * volume
+                avg_entry = weighted_entry / total_volume if total_volume > 0 else 0
+
+                direction = 1 if action == "sell" else -1
+                profit = (price - avg_entry) * total_volume * direction
+                pl_pct = ((price - avg_entry) / avg_entry * 100 * direction) if avg_entry > 0 else 0
+
+                account["balance"] += total_margin + profit
+
+                account["positions"][symbol] = remaining
+
+                account["trade_log"] += ({
+                    "timestamp": timestamp,
+                    "action": action,
+                    "symbol": symbol,
+                    "reason": reason,
+                    "price": price,
+                    "amount": total_volume,
+                    "profit": round(profit, 8),
+                    "pl_pct": round(pl_pct, 4),
+                    "balance": round(account["balance"], 8),
+                    "avg_entry": round(avg_entry, 8),
+                },)
+                save_account(bot_id, account)
+                logger.info(f"{action.upper()} executed for {symbol} at {price} (bot {bot_id})")
+                return jsonify({"status": "success", "action": action, "symbol": symbol, "price": price}), 200
 
         return jsonify({"status": "error", "message": "Unhandled action"}), 400
 
@@ -1047,143 +1590,202 @@ def webhook():
         logger.error(f"Webhook processing failed: {str(e)}", exc_info=True)
         return jsonify({"status": "error", "message": "Internal server error"}), 500
 
+last_stop_loss_check = {}  # bot_id -> (account version, kill switch inputs, prices) seen by the last full check
+
 def check_and_trigger_stop_losses_and_kill_switch():
+    failures = 0
     while True:
         try:
-            now = datetime.now(ZoneInfo("America/Edmonton"))
-            reset_kill_switch_daily()
-            
-            all_symbols = set()
+            now = datetime.now(EDMONTON_TZ)
+
+            # price_poller keeps latest_prices fresh; every bot in this pass is checked against one snapshot
+            prices = latest_prices.copy()
+            missing_symbols = set()
             for bot_id in BOTS:
-                account = load_account(bot_id)
-                all_symbols.update(account["positions"].keys())
-            if all_symbols:
-                fetch_latest_prices(list(all_symbols))
+                account = account_cache.get(bot_id)
+                if account is not None:
+                    missing_symbols.update(unpriced_symbols(account["positions"], prices))
+            if missing_symbols or not last_price_fetch:
+                # Right after startup, or for a symbol the poller hasn't priced yet, fetch inline rather than
+                # evaluate positions without a quote
+                prices = fetch_latest_prices(missing_symbols)
+            reset_kill_switch_daily(prices)
+            # Every exit recorded in this pass shares one timestamp
+            timestamp = pretty_now()
 
             for bot_id in BOTS:
-                with kill_switch_lock:
+                # Hold the bot's lock for the whole check so webhook trades cannot interleave with it
+                with bot_locks[bot_id]:
                     kill_switch_status = load_kill_switch_state(bot_id)
                     if kill_switch_status["active"]:
                         continue  # Skip if kill switch is already active
 
-                account = load_account(bot_id)
-                settings = load_bot_settings(bot_id)
-                kill_switch_pct = settings.get("kill_switch_pct", 5.0)
-                prices = latest_prices.copy()
-                modified = False
-
-                # Calculate equity for kill switch
-                position_stats = calculate_position_stats(account["positions"], prices)
-                total_margin = sum(pos['margin_used'] for pos in position_stats)
-                total_pl = sum(pos['pnl'] for pos in position_stats)
-                available_cash = float(account["balance"])
-                equity = available_cash + total_margin + total_pl
+                    settings = load_bot_settings(bot_id)
+                    kill_switch_pct = settings.get("kill_switch_pct", 5.0)
+                    # Same account, prices and threshold as the last pass give the same result, unless a breach timer is running
+                    check_key = (account_versions[bot_id], kill_switch_pct, kill_switch_status.get("starting_equity_date"))
+                    if not kill_switch_breach_start.get(bot_id) and last_stop_loss_check.get(bot_id) == (check_key, prices):
+                        continue
 
-                # Kill switch logic
-                with kill_switch_lock:
-                    today = now.strftime('%Y-%m-%d')
-                    starting_equity = kill_switch_status.get("starting_equity", equity)
-                    if kill_switch_status.get("starting_equity_date") != today:
-                        logger.warning(f"Starting equity not found or outdated for bot {bot_id}, should be set by reset_kill_switch_daily")
-                        starting_equity = equity
-                    loss_pct = ((starting_equity - equity) / starting_equity * 100) if starting_equity > 0 else 0
-
-                    if (now - last_price_update_dt).total_seconds() > MAX_STALE_PRICE:
-                        logger.warning(f"Stale price data for bot {bot_id}, skipping kill switch check")
+                    # Read the cached account in place (cached accounts are replaced, never mutated) and
+                    # take a private copy only once something actually has to change
+                    account = account_cache.get(bot_id)
+                    if account is None:
+                        try:
+                            account = load_account(bot_id)
+                        except Exception:
+                            continue  # Unreadable account files; logged by load_account
+                    owned = False
+                    modified = False
+
+                    missing = unpriced_symbols(account["positions"], prices)
+                    if not last_price_fetch or missing:
+                        # Equity needs every held symbol priced; stop loss/take profit below still run per priced symbol
+                        warn_throttled(("kill_switch_check", bot_id), f"Skipping kill switch check for bot {bot_id}, no price for: {', '.join(missing) or 'any symbol'}")
                         kill_switch_breach_start[bot_id] = None
-                    elif loss_pct >= kill_switch_pct:
-                        if not kill_switch_breach_start.get(bot_id):
-                            kill_switch_breach_start[bot_id] = now
-                            logger.info(f"Kill switch breach detected for bot {bot_id}: {loss_pct}% loss")
-                        elif (now - kill_switch_breach_start[bot_id]).total_seconds() >= KILL_SWITCH_DELAY:
-                            logger.info(f"Kill switch triggered for bot {bot_id}: {loss_pct}% loss sustained")
-                            liquidate_all_positions(bot_id, account, prices, reason="Kill Switch Triggered")
-                            kill_switch_status["active"] = True
-                            kill_switch_status["reset_uuid"] = str(uuid.uuid4())
-                            save_kill_switch_state(bot_id, kill_switch_status)
-                            modified = True
                     else:
-                        kill_switch_breach_start[bot_id] = None
-
-                # Stop loss and take profit checks
-                for symbol, positions in account["positions"].items():
-                    current_price = get_kraken_price(symbol)
-                    if not current_price or current_price <= 0:
-                        continue
-                    new_positions = []
-                    for position in positions:
-                        position_type = position.get("type", "long")
-                        stop_loss_price = position.get(
-                            "stop_loss_price",
-                            position["entry_price"] * (1 - position.get("stop_loss_pct", 2.5) / 100)
-                            if position_type == "long"
-                            else position["entry_price"] * (1 + position.get("stop_loss_pct", 2.5) / 100)
-                        )
-                        take_profit_price = position.get("take_profit_price")
-                        take_profit_pct = position.get("take_profit_pct", 3.0)
-                        entry = float(position.get("entry_price", 0))
-                        volume = float(position.get("volume", 0))
-                        margin_used = float(position.get("margin_used", 0))
-                        stop_loss_pct = float(position.get("stop_loss_pct", 2.5))
-                        leverage = int(position.get("leverage", 1))
-
-                        if position_type == "long":
-                            stop_loss_trigger = current_price <= stop_loss_price
-                            take_profit_trigger = take_profit_price is not None and current_price >= take_profit_price
+                        # Calculate equity for kill switch
+                        position_stats = calculate_position_stats(account["positions"], prices)
+                        total_margin = sum(pos.margin_used for pos in position_stats)
+                        total_pl = sum(pos.pnl for pos in position_stats)
+                        available_cash = float(account["balance"])
+                        equity = available_cash + total_margin + total_pl
+
+                        # Kill switch logic
+                        today = now.strftime('%Y-%m-%d')
+                        starting_equity = kill_switch_status.get("starting_equity", equity)
+                        if kill_switch_status.get("starting_equity_date") != today:
+                            logger.warning(f"Starting equity not found or outdated for bot {bot_id}, should be set by reset_kill_switch_daily")
+                            starting_equity = equity
+                        loss_pct = ((starting_equity - equity) / starting_equity * 100) if starting_equity > 0 else 0
+
+                        if (now - last_price_update_dt).total_seconds() > MAX_STALE_PRICE:
+                            logger.warning(f"Stale price data for bot {bot_id}, skipping kill switch check")
+                            kill_switch_breach_start[bot_id] = None
+                        elif loss_pct >= kill_switch_pct:
+                            if not kill_switch_breach_start.get(bot_id):
+                                kill_switch_breach_start[bot_id] = now
+                                logger.info(f"Kill switch breach detected for bot {bot_id}: {loss_pct}% loss")
+                            elif (now - kill_switch_breach_start[bot_id]).total_seconds() >= KILL_SWITCH_DELAY:
+                                logger.info(f"Kill switch triggered for bot {bot_id}: {loss_pct}% loss sustained")
+                                account = load_account(bot_id)
+                                owned = True
+                                liquidate_all_positions(bot_id, account, prices, timestamp, reason="Kill Switch Triggered")
+                                kill_switch_status["active"] = True
+                                kill_switch_status["reset_uuid"] = str(uuid.uuid4())
+                                save_kill_switch_state(bot_id, kill_switch_status)
+                                modified = True
                         else:
-                            stop_loss_trigger = current_price >= stop_loss_price
-                            take_profit_trigger = take_profit_price is not None and current_price <= take_profit_price
-
-                        if stop_loss_trigger or take_profit_trigger:
-                            if stop_loss_trigger:
-                                exit_price = stop_loss_price
-                                reason = f"Stop Loss ({stop_loss_pct}%)"
-                            elif take_profit_trigger:
-                                exit_price = take_profit_price
-                                reason = f"Take Profit ({take_profit_pct}%)"
-                            else:
-                                exit_price = current_price
-                                reason = "Unknown"
+                            kill_switch_breach_start[bot_id] = None
+
+                    # Stop loss and take profit checks
+                    for symbol, positions in list(account["positions"].items()):
+                        current_price = prices.get(symbol, 0)
+                        if not current_price or current_price <= 0:
+                            continue
+                        new_positions = []
+                        for position in positions:
+                            # Positions are normalized at load, so the untriggered common case is two float compares
+                            position_type = position["type"]
+                            stop_loss_price = position["stop_loss_price"]
+                            take_profit_price = position["take_profit_price"]
 
                             if position_type == "long":
-                                profit = (exit_price - entry) * volume
-                                action = "sell"
+                                stop_loss_trigger = current_price <= stop_loss_price
+                                take_profit_trigger = take_profit_price is not None and current_price >= take_profit_price
                             else:
-                                profit = (entry - exit_price) * volume
-                                action = "cover"
-
-                            account["balance"] += margin_used + profit
-
-                            account["trade_log"].append({
-                                "timestamp": pretty_now(),
-                                "action": action,
-                                "symbol": symbol,
-                                "reason": reason,
-                                "price": exit_price,
-                                "amount": volume,
-                                "profit": round(profit, 8),
-                                "balance": round(account["balance"], 8),
-                                "leverage": leverage,
-                                "avg_entry": round(entry, 8),
-                            })
-                            modified = True
-                            logger.info(f"{reason} triggered for {symbol} {position_type} at {exit_price} (bot {bot_id})")
-                        else:
-                            new_positions.append(position)
+                                stop_loss_trigger = current_price >= stop_loss_price
+                                take_profit_trigger = take_profit_price is not None and current_price <= take_profit_price
+
+                            if stop_loss_trigger or take_profit_trigger:
+                                if not owned:
+                                    account = load_account(bot_id)
+                                    owned = True
+                                take_profit_pct = position["take_profit_pct"]
+                                entry = position["entry_price"]
+                                volume = position["volume"]
+                                margin_used = position["margin_used"]
+                                stop_loss_pct = position["stop_loss_pct"]
+                                leverage = position["leverage"]
+                                if stop_loss_trigger:
+                                    exit_price = stop_loss_price
+                                    reason = f"Stop Loss ({stop_loss_pct}%)"
+                                elif take_profit_trigger:
+                                    exit_price = take_profit_price
+                                    reason = f"Take Profit ({take_profit_pct}%)"
+                                else:
+                                    exit_price = current_price
+                                    reason = "Unknown"
+
+                                profit = position_pnl(position_type, entry, exit_price, volume)
+                                action = "sell" if position_type == "long" else "cover"
+
+                                account["balance"] += margin_used + profit
+
+                                account["trade_log"] += ({
+                                    "timestamp": timestamp,
+                                    "action": action,
+                                    "symbol": symbol,
+                                    "reason": reason,
+                                    "price": exit_price,
+                                    "amount": volume,
+                                    "profit": round(profit, 8),
+                                    "balance": round(account["balance"], 8),
+                                    "leverage": leverage,
+                                    "avg_entry": round(entry, 8),
+                                },)
+                                modified = True
+                                logger.info(f"{reason} triggered for {symbol} {position_type} at {exit_price} (bot {bot_id})")
+                            else:
+                                new_positions.append(position)
 
-                    account["positions"][symbol] = new_positions
+                        if len(new_positions) != len(positions):
+                            account["positions"][symbol] = new_positions
 
-                if modified:
-                    save_account(bot_id, account)
+                    if modified:
+                        save_account(bot_id, account)
+                    last_stop_loss_check[bot_id] = (check_key, prices)
 
+            failures = 0
         except Exception as e:
             logger.error(f"Error in stop loss/kill switch checker: {str(e)}", exc_info=True)
+            failures += 1
+
+        if failures:
+            # Back off exponentially while the checker keeps failing instead of logging the same error every pass
+            time.sleep(min(STOP_LOSS_INTERVAL * 2 ** failures, STOP_LOSS_MAX_BACKOFF))
+        else:
+            # Wake as soon as new prices arrive; the timeout still covers new trades and kill switch timers
+            price_update_event.wait(timeout=STOP_LOSS_INTERVAL)
+            price_update_event.clear()
 
-        time.sleep(2)
+def price_poller():
+    while True:
+        try:
+            # One batched Ticker call refreshes every supported pair for the dashboard, webhooks and stop-loss checks
+            fetch_latest_prices(kraken_pairs)
+        except Exception as e:
+            logger.error(f"Error in price poller: {str(e)}", exc_info=True)
+        # Back off exponentially while Kraken is failing so we don't hammer it every few seconds
+        time.sleep(min(PRICE_CACHE_TTL * 2 ** price_fetch_failures, PRICE_POLL_MAX_BACKOFF))
 
+# Load every account into memory once; later reads never touch disk
+for bot_id in BOTS:
+    try:
+        load_account(bot_id)
+    except Exception:
+        pass  # Logged by load_account; that bot's requests keep failing until its files are fixed
+price_poller_thread = threading.Thread(target=price_poller, daemon=True)
+price_poller_thread.start()
 stop_loss_thread = threading.Thread(target=check_and_trigger_stop_losses_and_kill_switch, daemon=True)
 stop_loss_thread.start()
 
+account_writer_thread = threading.Thread(target=account_writer, daemon=True)
+account_writer_thread.start()
+
 if __name__ == '__main__':
-    logger.info("Starting Flask server on port 5000")
-    app.run(host='0.0.0.0', port=5000, threaded=True)
+    # Accounts, prices and the background workers live in this process, so serve
+    # from a single multi-threaded process rather than forking workers
+    from waitress import serve
+    logger.info("Starting waitress server on port 5000")
+    serve(app, host='0.0.0.0', port=5000, threads=16)